@@ -0,0 +1,229 @@
+"""多数のファイルのリサンプリングをプロセスプールで並列に行う.
+
+- 時間軸とフィルタ (ResamplePlan) は親プロセスで1回だけ作成し、
+  プールの initializer で各ワーカーに1回だけ渡す
+- ワーカーは結果を返さず、出力先の .npy をmemmapで開いてチャンネルごとに直接書き込む
+  (大きな配列をプロセス間でpickleしない)。親プロセスには点数などの情報だけが返る
+- ワーカー数はCPUコア数に加えて、最も大きいファイルの処理に必要なメモリ量と
+  メモリの上限からも制限する
+
+使い方:
+    python batch_resample.py OUTPUT_DIR data/*.npy --method linear --workers 8
+"""
+
+import argparse
+import os
+import sys
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from resampling import DEFAULT_DST_PERIOD, DEFAULT_SRC_PERIOD, METHODS, ResamplePlan
+
+# メモリ上限を指定しない場合に使う空きメモリの割合
+DEFAULT_MEMORY_FRACTION = 0.5
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_COLUMNS = ["file", "output", "columns", "n_samples", "n_resampled", "error"]
+
+# ワーカープロセス内で共有する設定 (initializerで設定)
+_plan = None
+_columns = None
+_dtype = None
+
+
+def available_memory() -> int | None:
+    """利用可能なメモリ量[byte]. 取得できない場合はNone."""
+    try:
+        import psutil
+    except ImportError:
+        try:
+            return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+        except (AttributeError, ValueError, OSError):
+            return None
+    return psutil.virtual_memory().available
+
+
+def estimate_task_bytes(path: str | Path, plan: ResamplePlan) -> int:
+    """1ファイルの処理に必要なメモリ量の見積もり[byte].
+
+    入力をfloat64で読み込んだ大きさに、1チャンネル分の出力と補間の中間データを加える。
+    npyはヘッダーの形状から、それ以外はファイルサイズ (テキストは1値あたり8byte以上) から見積もる。
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".npy":
+        array = np.load(path, mmap_mode="r")
+        n_values = array.size
+        n_samples = len(array)
+    else:
+        n_values = n_samples = path.stat().st_size // 8
+    ratio = plan.up / plan.down
+    return int(n_values * 8 + n_samples * 8 * (2 + 2 * ratio))
+
+
+def plan_workers(estimates: Sequence[int], max_workers: int | None, memory_limit: int | None) -> int:
+    """CPUコア数とメモリ上限から同時に処理するファイル数を決める.
+
+    Args:
+        estimates (Sequence[int]): ファイルごとの必要メモリ量の見積もり[byte]
+        max_workers (int | None): ワーカー数の上限。Noneの場合はCPUコア数
+        memory_limit (int | None): 全ワーカーで使ってよいメモリ量[byte]。
+            Noneの場合は空きメモリの DEFAULT_MEMORY_FRACTION
+
+    Returns:
+        int: ワーカー数 (1以上)
+
+    """
+    workers = min(max_workers or os.cpu_count() or 1, max(len(estimates), 1))
+    if memory_limit is None:
+        available = available_memory()
+        memory_limit = int(available * DEFAULT_MEMORY_FRACTION) if available is not None else None
+    if memory_limit is not None and estimates:
+        workers = min(workers, memory_limit // max(max(estimates), 1))
+    return max(int(workers), 1)
+
+
+def _init_worker(plan: ResamplePlan, columns: list | None, dtype: str) -> None:
+    """ワーカープロセスの初期化. 設定はここで1回だけ受け取る."""
+    global _plan, _columns, _dtype  # noqa: PLW0603
+    _plan, _columns, _dtype = plan, columns, np.dtype(dtype)
+
+
+def _load_channels(path: Path) -> tuple[np.ndarray, list]:
+    """入力ファイルを (点数, チャンネル数) の配列として読み込む. npyはmemmapのまま扱う."""
+    if path.suffix.lower() == ".npy":
+        array = np.load(path, mmap_mode="r")
+        array = array.reshape(len(array), -1)
+        names = [f"ch{i}" for i in range(array.shape[1])]
+        if _columns is not None:
+            indices = [names.index(c) for c in _columns]
+            return array[:, indices], list(_columns)
+        return array, names
+
+    from pipeline import load_table
+
+    table = load_table(path)
+    columns = list(_columns or table.select_dtypes("number").columns)
+    return table[columns].to_numpy(dtype=np.float64), columns
+
+
+def _resample_file(path: str, output_path: str) -> dict:
+    """1ファイルをリサンプリングしてmemmapに書き込む (ワーカープロセスで実行)."""
+    data, columns = _load_channels(Path(path))
+    n_samples = data.shape[0]
+    n_out = _plan.output_length(n_samples)
+    output = np.lib.format.open_memmap(output_path, mode="w+", dtype=_dtype, shape=(len(columns), n_out))
+    # チャンネルごとに処理して中間データを1チャンネル分に抑える
+    for i in range(len(columns)):
+        output[i] = _plan.apply(data[:, i])
+    output.flush()
+    del output
+    profiling.dump()
+    return {
+        "file": path,
+        "output": output_path,
+        "columns": " ".join(map(str, columns)),
+        "n_samples": n_samples,
+        "n_resampled": n_out,
+    }
+
+
+def batch_resample(  # noqa: PLR0913
+    files: Sequence[str | Path],
+    output_dir: str | Path,
+    plan: ResamplePlan | None = None,
+    columns: list | None = None,
+    max_workers: int | None = None,
+    memory_limit: int | None = None,
+    dtype: str = "float64",
+    progress: Callable[[int, int], None] | None = None,
+) -> pd.DataFrame:
+    """複数のファイルを並列にリサンプリング.
+
+    結果は output_dir/<通し番号>_<ファイル名>.npy に (チャンネル数, 点数) の配列として保存され、
+    np.load(path, mmap_mode="r") でコピーせずに読み込める。
+
+    Args:
+        files (Sequence[str | Path]): 入力ファイル
+        output_dir (str | Path): 出力先ディレクトリ
+        plan (ResamplePlan | None): リサンプリングの設定。Noneの場合は既定値
+        columns (list | None): 対象の列。npyの場合は "ch0" のような名前。Noneの場合は全ての数値列
+        max_workers (int | None): ワーカー数の上限。Noneの場合はCPUコア数
+        memory_limit (int | None): 全ワーカーで使ってよいメモリ量[byte]
+        dtype (str): 出力のデータ型
+        progress (Callable[[int, int], None] | None): (完了数, 全体数) を受け取る進捗の通知先
+
+    Returns:
+        pd.DataFrame: ファイルごとの出力先と点数。output_dir/manifest.csv にも保存する
+
+    """
+    plan = plan or ResamplePlan()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    files = [str(f) for f in files]
+    # 同じ名前のファイルが別のディレクトリにあっても上書きしないよう番号を付ける
+    outputs = [str(output_dir / f"{i:05d}_{Path(f).stem}.npy") for i, f in enumerate(files)]
+
+    # 同じファイルが複数回指定されても区別できるよう、結果は入力の順番で管理する
+    records = [None] * len(files)
+    if files:
+        workers = plan_workers([estimate_task_bytes(f, plan) for f in files], max_workers, memory_limit)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(plan, columns, dtype),
+        ) as executor:
+            futures = {
+                executor.submit(_resample_file, f, o): i for i, (f, o) in enumerate(zip(files, outputs, strict=True))
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                try:
+                    records[i] = future.result()
+                except Exception as e:  # noqa: BLE001
+                    records[i] = {"file": files[i], "error": f"{type(e).__name__}: {e}"}
+                if progress is not None:
+                    progress(done, len(files))
+
+    manifest = pd.DataFrame.from_records(records, columns=MANIFEST_COLUMNS)
+    manifest.to_csv(output_dir / MANIFEST_NAME, index=False)
+    return manifest
+
+
+def main(argv: list | None = None) -> int:
+    """コマンドラインの処理."""
+    parser = argparse.ArgumentParser(description="Resample many files in parallel")
+    parser.add_argument("output_dir", help="output directory")
+    parser.add_argument("files", nargs="+", help="input files")
+    parser.add_argument("--method", choices=METHODS, default="linear")
+    parser.add_argument("--src-period", type=float, default=DEFAULT_SRC_PERIOD)
+    parser.add_argument("--dst-period", type=float, default=DEFAULT_DST_PERIOD)
+    parser.add_argument("--columns", nargs="*", help="columns to resample (default: all numeric)")
+    parser.add_argument("--workers", type=int, help="maximum number of worker processes")
+    parser.add_argument("--memory-limit-mb", type=int, help="memory budget for all workers")
+    parser.add_argument("--dtype", default="float64", choices=["float32", "float64"])
+    args = parser.parse_args(argv)
+
+    memory_limit = args.memory_limit_mb * 1024**2 if args.memory_limit_mb else None
+    manifest = batch_resample(
+        args.files,
+        args.output_dir,
+        ResamplePlan(args.src_period, args.dst_period, args.method),
+        columns=args.columns,
+        max_workers=args.workers,
+        memory_limit=memory_limit,
+        dtype=args.dtype,
+        progress=lambda done, total: print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True),
+    )
+    print(file=sys.stderr)
+    failed = manifest["error"].notna().sum()
+    manifest_path = Path(args.output_dir) / MANIFEST_NAME
+    print(f"Resampled {len(manifest) - failed} file(s), {failed} failed. Manifest: {manifest_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""遷移位置を基準とした振動データの切り出し (エポック).
+
+StateTransitionAnalyzer で求めた off→on の位置をトリガーとして、
+振動データの前後一定区間を (イベント数, チャンネル数, 窓長) の形で扱う。
+
+切り出しは sliding_window_view (ストライドによるビュー) の上で行い、
+1イベントずつのスライスやコピーは行わない。
+- epochs[i]: 1イベント分のビュー (コピーなし)
+- view(): トリガーが等間隔の場合は全イベントのビュー (コピーなし)
+- array() / batches(): ファンシーインデックスで一括に取り出した配列
+- mean_var(): バッチごとに平均・分散を更新し、全イベントを同時に展開せずに集計する
+
+edge="pad" でも元のデータはコピーしない。範囲外にかかるイベントの窓だけを
+fill_value で埋めた小さな配列に作り、それ以外のイベントはビューから取り出す。
+
+振動データは batch_resample の出力のようなmemmapでもよい。
+"""
+
+from collections.abc import Iterator
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided, sliding_window_view
+
+from resampling import map_indices
+
+EDGE_MODES = ("drop", "clip", "pad")
+DEFAULT_BATCH_SIZE = 1024
+
+
+class Epochs:
+    """トリガー位置の前後を切り出したデータ.
+
+    Attributes:
+        data (np.ndarray): (チャンネル数, 点数) の振動データ (コピーしない)
+        triggers (np.ndarray): 採用したトリガー位置 (元のデータでのインデックス)
+        starts (np.ndarray): 各イベントの窓の開始位置 (dataでのインデックス。edge="pad"の場合は範囲外の値もある)
+        pre (int): トリガーより前の点数
+        post (int): トリガー以降の点数 (トリガーの点を含む)
+        window (int): 窓長 (pre + post)
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        data: np.ndarray,
+        triggers: np.ndarray,
+        pre: int,
+        post: int,
+        edge: str = "drop",
+        fill_value: float = np.nan,
+    ) -> None:
+        """初期化処理.
+
+        Args:
+            data (np.ndarray): (チャンネル数, 点数) または (点数,) の振動データ
+            triggers (np.ndarray): トリガー位置 (dataの時間軸でのインデックス)
+            pre (int): トリガーより前の点数
+            post (int): トリガー以降の点数 (トリガーの点を含む)
+            edge (str): 窓がデータの範囲外にかかる場合の扱い
+                "drop": そのイベントを除く
+                "clip": 窓を範囲内にずらす (トリガーの位置は窓内で中央からずれる)
+                "pad": 範囲外を fill_value で埋める (範囲外にかかるイベントの窓だけをコピーする)
+                トリガー自体がデータの範囲外の場合、"drop" では除き、"clip" と "pad" では ValueError
+            fill_value (float): edge="pad" の場合に埋める値
+
+        """
+        if edge not in EDGE_MODES:
+            msg = f"edge must be one of {EDGE_MODES}, got {edge!r}"
+            raise ValueError(msg)
+        if pre < 0 or post < 1:
+            msg = "pre must be >= 0 and post must be >= 1"
+            raise ValueError(msg)
+
+        data = np.asarray(data)
+        if data.ndim == 1:
+            data = data[np.newaxis, :]
+        triggers = np.asarray(triggers, dtype=np.int64)
+        self.pre = pre
+        self.post = post
+        self.window = pre + post
+        n_samples = data.shape[-1]
+
+        outside = (triggers < 0) | (triggers >= n_samples)
+        if edge != "drop" and outside.any():
+            msg = f"triggers must be in [0, {n_samples}), got {triggers[outside][:5].tolist()}"
+            raise ValueError(msg)
+
+        starts = triggers - pre
+        if edge == "drop":
+            keep = (starts >= 0) & (starts + self.window <= n_samples)
+            triggers, starts = triggers[keep], starts[keep]
+        elif edge == "clip":
+            starts = np.clip(starts, 0, max(n_samples - self.window, 0))
+        if edge == "pad":
+            edge_events = np.flatnonzero((starts < 0) | (starts + self.window > n_samples))
+            self._edge_windows = _padded_windows(data, starts[edge_events], self.window, fill_value)
+        else:
+            if self.window > n_samples:
+                msg = f"window ({self.window}) is longer than the data ({n_samples})"
+                raise ValueError(msg)
+            edge_events = np.empty(0, dtype=np.int64)
+            self._edge_windows = np.empty((0, data.shape[0], self.window), dtype=data.dtype)
+        # 各イベントの _edge_windows での位置 (範囲内のイベントは -1)
+        self._edge_index = np.full(len(starts), -1, dtype=np.int64)
+        self._edge_index[edge_events] = np.arange(len(edge_events))
+
+        self.data = data
+        self.triggers = triggers
+        self.starts = starts
+        # (チャンネル数, 窓の開始位置, 窓長) のビュー。窓がデータより長い場合 (edge="pad" のみ) は全て範囲外のイベント
+        self._windows = sliding_window_view(data, self.window, axis=-1) if self.window <= n_samples else None
+
+    def __len__(self) -> int:
+        """イベント数."""
+        return len(self.starts)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        """i番目のイベントの (チャンネル数, 窓長) のビュー (edge="pad" で範囲外にかかるイベントは埋めた窓)."""
+        j = self._edge_index[i]
+        if j >= 0:
+            return self._edge_windows[j]
+        return self._windows[:, self.starts[i]]
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        """(イベント数, チャンネル数, 窓長)."""
+        return len(self), self.data.shape[0], self.window
+
+    def lags(self, sample_period: float = 1.0) -> np.ndarray:
+        """窓内の各点のトリガーからの時間 (sample_period=1 の場合は点数)."""
+        return np.arange(-self.pre, self.post) * sample_period
+
+    def view(self) -> np.ndarray:
+        """全イベントの (イベント数, チャンネル数, 窓長) のビュー.
+
+        トリガーが等間隔 (周期的なイベントなど) の場合のみコピーなしで作れる。
+        等間隔でない場合や、edge="pad" で範囲外にかかるイベントがある場合は
+        ValueError となるため array() か batches() を使う。
+        """
+        if len(self._edge_windows):
+            msg = "some events are padded at the edges; use array() or batches()"
+            raise ValueError(msg)
+        steps = np.diff(self.starts)
+        if len(steps) and not (steps == steps[0]).all():
+            msg = "triggers are not evenly spaced; use array() or batches()"
+            raise ValueError(msg)
+        if len(self) == 0:
+            return np.empty(self.shape, dtype=self.data.dtype)
+        step = int(steps[0]) if len(steps) else 0
+        base = self._windows[:, self.starts[0]]
+        strides = (step * self.data.strides[-1], *base.strides)
+        return as_strided(base, shape=self.shape, strides=strides, writeable=False)
+
+    def array(self, events: slice | np.ndarray | None = None) -> np.ndarray:
+        """イベントを (イベント数, チャンネル数, 窓長) の配列として一括で取り出す.
+
+        Args:
+            events (slice | np.ndarray | None): 取り出すイベント。Noneの場合は全て
+
+        """
+        starts = self.starts if events is None else self.starts[events]
+        if not len(self._edge_windows):
+            return self._windows[:, starts].transpose(1, 0, 2)
+        edge_index = self._edge_index if events is None else self._edge_index[events]
+        padded = edge_index >= 0
+        out = np.empty((len(starts), *self.shape[1:]), dtype=self._edge_windows.dtype)
+        out[padded] = self._edge_windows[edge_index[padded]]
+        if not padded.all():
+            out[~padded] = self._windows[:, starts[~padded]].transpose(1, 0, 2)
+        return out
+
+    def batches(self, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[np.ndarray]:
+        """batch_sizeイベントずつの (イベント数, チャンネル数, 窓長) の配列を返すイテレータ."""
+        for start in range(0, len(self), batch_size):
+            yield self.array(slice(start, start + batch_size))
+
+    def mean_var(self, batch_size: int = DEFAULT_BATCH_SIZE, ddof: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """イベント間の平均と分散 (アンサンブル平均).
+
+        バッチごとの平均と偏差平方和を合成するため、メモリ使用量は batch_size に比例する。
+        edge="pad" で埋めた nan は無視する。
+
+        Args:
+            batch_size (int): 1度に取り出すイベント数
+            ddof (int): 分散の自由度の補正 (標本分散の場合は1)
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (チャンネル数, 窓長) の平均と分散
+
+        """
+        shape = self.shape[1:]
+        count = np.zeros(shape)
+        mean = np.zeros(shape)
+        m2 = np.zeros(shape)
+        for batch in self.batches(batch_size):
+            batch = batch.astype(np.float64, copy=False)
+            valid = ~np.isnan(batch)
+            n_b = valid.sum(axis=0)
+            sum_b = np.where(valid, batch, 0.0).sum(axis=0)
+            mean_b = np.divide(sum_b, n_b, out=np.zeros(shape), where=n_b > 0)
+            m2_b = np.where(valid, (batch - mean_b) ** 2, 0.0).sum(axis=0)
+            # 並列アルゴリズム (Chan et al.) でバッチの統計を合成
+            total = count + n_b
+            delta = mean_b - mean
+            ratio = np.divide(n_b, total, out=np.zeros(shape), where=total > 0)
+            mean += delta * ratio
+            m2 += m2_b + delta**2 * count * ratio
+            count = total
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, mean, np.nan)
+            var = np.where(count > ddof, m2 / (count - ddof), np.nan)
+        return mean, var
+
+
+def _padded_windows(data: np.ndarray, starts: np.ndarray, window: int, fill_value: float) -> np.ndarray:
+    """範囲外にかかる窓を (イベント数, チャンネル数, 窓長) の配列に作る.
+
+    範囲内の点だけを data から読み、残りは fill_value で埋める。
+    """
+    positions = starts[:, np.newaxis] + np.arange(window)
+    inside = (positions >= 0) & (positions < data.shape[-1])
+    dtype = np.result_type(data.dtype, type(fill_value))
+    windows = np.full((len(starts), data.shape[0], window), fill_value, dtype=dtype)
+    windows.transpose(1, 0, 2)[:, inside] = data[:, positions[inside]]
+    return windows
+
+
+def extract_epochs(  # noqa: PLR0913
+    data: np.ndarray,
+    triggers: np.ndarray,
+    pre: int,
+    post: int,
+    edge: str = "drop",
+    src_period: float | None = None,
+    dst_period: float | None = None,
+) -> Epochs:
+    """トリガー位置の前後を切り出す.
+
+    状態データと振動データのサンプリング周期が異なる場合 (resampling.md の 5msec → 8.192msec など) は
+    src_period と dst_period を指定すると、トリガー位置を振動データの時間軸に変換する。
+
+    Args:
+        data (np.ndarray): (チャンネル数, 点数) または (点数,) の振動データ
+        triggers (np.ndarray): トリガー位置 (get_off_to_on_transitions の結果など)
+        pre (int): トリガーより前の点数 (振動データの時間軸)
+        post (int): トリガー以降の点数 (振動データの時間軸)
+        edge (str): 範囲外の扱い ("drop", "clip", "pad")
+        src_period (float | None): triggersの時間軸のサンプリング周期[sec]
+        dst_period (float | None): dataのサンプリング周期[sec]
+
+    Returns:
+        Epochs: 切り出したデータ
+
+    """
+    if src_period is not None and dst_period is not None:
+        triggers = map_indices(triggers, src_period, dst_period)
+    return Epochs(data, triggers, pre, post, edge=edge)
@@ -0,0 +1,394 @@
+"""on/off状態の集計統計.
+
+遷移 (off→on / on→off) から on・off の継続時間 (dwell)、周期、デューティ比を
+ベクトル演算で求める。結果は EventSummary として保持し、ファイルやチャンクごとの
+部分的な集計を merge で足し合わせられるため、多数のファイルの統計を
+1回の走査と小さな集計結果の結合だけで得られる。
+
+- 継続時間・周期は固定のビン境界 (既定は対数で1桁20分割) のヒストグラムで保持し、
+  パーセンタイルはヒストグラムから求める (ビン幅程度の誤差がある)
+- 平均・標準偏差・最小・最大は正確な値
+- デューティ比は時刻の区間 (既定は1時間) ごとの on の点数と全点数で保持する
+
+遷移の定義は StateTransitionAnalyzer.get_off_to_on_transitions / get_on_to_off_transitions
+(np.diff が +1 / -1 となる位置) と同じ。データの先頭と末尾で途切れている区間は
+長さが確定しないため継続時間には含めない (デューティ比には含める)。
+"""
+
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+
+# 継続時間・周期のヒストグラムのビン境界[sec] 1msから1e5秒まで1桁を20分割
+DEFAULT_EDGES = np.geomspace(1e-3, 1e5, 8 * 20 + 1)
+DEFAULT_BUCKET_SECONDS = 3600.0
+KINDS = ("on", "off", "period")
+
+
+class EventSummary:
+    """マージ可能な集計結果.
+
+    Attributes:
+        sample_period (float): サンプリング周期[sec]
+        edges (np.ndarray): ヒストグラムのビン境界[sec]
+        bucket_seconds (float): デューティ比の区間の長さ[sec]
+        n_samples (int): 集計した点数
+        on_samples (int): onの点数
+        count (dict): 種類 ("on", "off", "period") -> 件数
+        total (dict): 種類 -> 合計[sec]
+        total_sq (dict): 種類 -> 2乗和[sec^2]
+        minimum (dict): 種類 -> 最小[sec]
+        maximum (dict): 種類 -> 最大[sec]
+        hist (dict): 種類 -> ヒストグラム。先頭と末尾は範囲外の件数
+        bucket_ids (np.ndarray): デューティ比の区間番号 (区間の開始時刻 / bucket_seconds)
+        bucket_on (np.ndarray): 区間ごとのonの点数
+        bucket_total (np.ndarray): 区間ごとの点数
+
+    """
+
+    def __init__(
+        self,
+        sample_period: float,
+        edges: np.ndarray = DEFAULT_EDGES,
+        bucket_seconds: float = DEFAULT_BUCKET_SECONDS,
+    ) -> None:
+        """空の集計結果を作成.
+
+        Args:
+            sample_period (float): サンプリング周期[sec]
+            edges (np.ndarray): ヒストグラムのビン境界[sec]
+            bucket_seconds (float): デューティ比の区間の長さ[sec]
+
+        """
+        self.sample_period = float(sample_period)
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.bucket_seconds = float(bucket_seconds)
+        self.n_samples = 0
+        self.on_samples = 0
+        self.count = dict.fromkeys(KINDS, 0)
+        self.total = dict.fromkeys(KINDS, 0.0)
+        self.total_sq = dict.fromkeys(KINDS, 0.0)
+        self.minimum = dict.fromkeys(KINDS, np.inf)
+        self.maximum = dict.fromkeys(KINDS, -np.inf)
+        self.hist = {kind: np.zeros(len(self.edges) + 1, dtype=np.int64) for kind in KINDS}
+        self.bucket_ids = np.empty(0, dtype=np.int64)
+        self.bucket_on = np.empty(0, dtype=np.int64)
+        self.bucket_total = np.empty(0, dtype=np.int64)
+
+    def add_durations(self, kind: str, samples: np.ndarray) -> None:
+        """継続時間・周期を追加.
+
+        Args:
+            kind (str): "on", "off", "period" のいずれか
+            samples (np.ndarray): 長さ[点数]の配列
+
+        """
+        if len(samples) == 0:
+            return
+        seconds = np.asarray(samples, dtype=np.float64) * self.sample_period
+        self.count[kind] += len(seconds)
+        self.total[kind] += float(seconds.sum())
+        self.total_sq[kind] += float(np.dot(seconds, seconds))
+        self.minimum[kind] = min(self.minimum[kind], float(seconds.min()))
+        self.maximum[kind] = max(self.maximum[kind], float(seconds.max()))
+        bins = np.searchsorted(self.edges, seconds, side="right")
+        self.hist[kind] += np.bincount(bins, minlength=len(self.edges) + 1)
+
+    def add_buckets(self, ids: np.ndarray, on: np.ndarray, total: np.ndarray) -> None:
+        """デューティ比の区間ごとの点数を追加 (同じ区間番号は合算)."""
+        ids = np.concatenate((self.bucket_ids, ids))
+        on = np.concatenate((self.bucket_on, on))
+        total = np.concatenate((self.bucket_total, total))
+        self.bucket_ids, inverse = np.unique(ids, return_inverse=True)
+        self.bucket_on = np.bincount(inverse, weights=on, minlength=len(self.bucket_ids)).astype(np.int64)
+        self.bucket_total = np.bincount(inverse, weights=total, minlength=len(self.bucket_ids)).astype(np.int64)
+
+    def merge(self, other: "EventSummary") -> "EventSummary":
+        """別の集計結果を足し合わせる (自身を更新して返す)."""
+        if (
+            other.sample_period != self.sample_period
+            or other.bucket_seconds != self.bucket_seconds
+            or not np.array_equal(other.edges, self.edges)
+        ):
+            msg = "cannot merge summaries with different sample_period, edges or bucket_seconds"
+            raise ValueError(msg)
+        self.n_samples += other.n_samples
+        self.on_samples += other.on_samples
+        for kind in KINDS:
+            self.count[kind] += other.count[kind]
+            self.total[kind] += other.total[kind]
+            self.total_sq[kind] += other.total_sq[kind]
+            self.minimum[kind] = min(self.minimum[kind], other.minimum[kind])
+            self.maximum[kind] = max(self.maximum[kind], other.maximum[kind])
+            self.hist[kind] += other.hist[kind]
+        self.add_buckets(other.bucket_ids, other.bucket_on, other.bucket_total)
+        return self
+
+    @classmethod
+    def merge_all(cls, summaries: Iterable["EventSummary"]) -> "EventSummary":
+        """複数の集計結果を足し合わせた新しい集計結果."""
+        merged = None
+        for summary in summaries:
+            if merged is None:
+                merged = cls(summary.sample_period, summary.edges, summary.bucket_seconds)
+            merged.merge(summary)
+        if merged is None:
+            msg = "no summaries to merge"
+            raise ValueError(msg)
+        return merged
+
+    def mean(self, kind: str) -> float:
+        """平均[sec]. 件数が0の場合はnan."""
+        return self.total[kind] / self.count[kind] if self.count[kind] else np.nan
+
+    def std(self, kind: str) -> float:
+        """標準偏差[sec] (母標準偏差). 件数が0の場合はnan."""
+        if not self.count[kind]:
+            return np.nan
+        mean = self.mean(kind)
+        return float(np.sqrt(max(self.total_sq[kind] / self.count[kind] - mean * mean, 0.0)))
+
+    def percentile(self, kind: str, q: float | np.ndarray) -> float | np.ndarray:
+        """ヒストグラムから求めたパーセンタイル[sec].
+
+        ビン内は線形に補間し、最小・最大の範囲に収める。件数が0の場合はnan。
+        """
+        if not self.count[kind]:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        # 範囲外のビンは最小・最大を端とする
+        lower = np.concatenate(([self.minimum[kind]], self.edges))
+        upper = np.concatenate((self.edges, [self.maximum[kind]]))
+        cum = np.cumsum(self.hist[kind])
+        target = np.asarray(q, dtype=np.float64) / 100 * cum[-1]
+        idx = np.minimum(np.searchsorted(cum, target, side="left"), len(cum) - 1)
+        before = np.where(idx > 0, cum[idx - 1], 0)
+        frac = np.where(self.hist[kind][idx] > 0, (target - before) / np.maximum(self.hist[kind][idx], 1), 0.0)
+        value = lower[idx] + (upper[idx] - lower[idx]) * frac
+        return np.clip(value, self.minimum[kind], self.maximum[kind])
+
+    def histogram(self, kind: str) -> tuple[np.ndarray, np.ndarray]:
+        """範囲内のヒストグラム. (件数, ビン境界) を np.histogram と同じ形式で返す."""
+        return self.hist[kind][1:-1].copy(), self.edges.copy()
+
+    def duty_cycle(self) -> float:
+        """全体のデューティ比 (onの割合)."""
+        return self.on_samples / self.n_samples if self.n_samples else np.nan
+
+    def duty_cycle_series(self) -> tuple[np.ndarray, np.ndarray]:
+        """区間ごとのデューティ比. (区間の開始時刻[sec], onの割合) を返す."""
+        return self.bucket_ids * self.bucket_seconds, self.bucket_on / np.maximum(self.bucket_total, 1)
+
+    def describe(self) -> dict:
+        """主な統計量の辞書 (表示・DataFrame化用)."""
+        description = {"n_samples": self.n_samples, "duty_cycle": self.duty_cycle()}
+        for kind in KINDS:
+            p50, p90, p99 = self.percentile(kind, np.array([50, 90, 99]))
+            description[kind] = {
+                "count": self.count[kind],
+                "mean": self.mean(kind),
+                "std": self.std(kind),
+                "min": self.minimum[kind] if self.count[kind] else np.nan,
+                "max": self.maximum[kind] if self.count[kind] else np.nan,
+                "p50": float(p50),
+                "p90": float(p90),
+                "p99": float(p99),
+            }
+        return description
+
+    def save(self, path: str | Path) -> None:
+        """npz形式で保存. 多数のファイルの部分集計を後でまとめるときに使う."""
+        arrays = {
+            "sample_period": self.sample_period,
+            "edges": self.edges,
+            "bucket_seconds": self.bucket_seconds,
+            "n_samples": self.n_samples,
+            "on_samples": self.on_samples,
+            "bucket_ids": self.bucket_ids,
+            "bucket_on": self.bucket_on,
+            "bucket_total": self.bucket_total,
+        }
+        for kind in KINDS:
+            arrays[f"{kind}_stats"] = np.array(
+                [self.count[kind], self.total[kind], self.total_sq[kind], self.minimum[kind], self.maximum[kind]],
+            )
+            arrays[f"{kind}_hist"] = self.hist[kind]
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "EventSummary":
+        """saveで保存した集計結果を読み込む."""
+        with np.load(path) as data:
+            summary = cls(float(data["sample_period"]), data["edges"], float(data["bucket_seconds"]))
+            summary.n_samples = int(data["n_samples"])
+            summary.on_samples = int(data["on_samples"])
+            summary.bucket_ids = data["bucket_ids"]
+            summary.bucket_on = data["bucket_on"]
+            summary.bucket_total = data["bucket_total"]
+            for kind in KINDS:
+                count, total, total_sq, minimum, maximum = data[f"{kind}_stats"]
+                summary.count[kind] = int(count)
+                summary.total[kind] = float(total)
+                summary.total_sq[kind] = float(total_sq)
+                summary.minimum[kind] = float(minimum)
+                summary.maximum[kind] = float(maximum)
+                summary.hist[kind] = data[f"{kind}_hist"]
+        return summary
+
+
+class EventStatsBuilder:
+    """状態の配列をチャンクごとに受け取って EventSummary を作るクラス.
+
+    チャンクの境界をまたぐ区間も前のチャンクの状態を引き継いで正しく扱う。
+    1ファイルを1回で渡す場合は summarize を使う。
+
+    Attributes:
+        summary (EventSummary): ここまでの集計結果
+        t0 (float): データ先頭の時刻[sec]。デューティ比の区間分けに使う
+
+    """
+
+    def __init__(
+        self,
+        sample_period: float,
+        t0: float = 0.0,
+        edges: np.ndarray = DEFAULT_EDGES,
+        bucket_seconds: float = DEFAULT_BUCKET_SECONDS,
+    ) -> None:
+        """初期化処理.
+
+        Args:
+            sample_period (float): サンプリング周期[sec]
+            t0 (float): データ先頭の時刻[sec] (UNIX時刻など)
+            edges (np.ndarray): ヒストグラムのビン境界[sec]
+            bucket_seconds (float): デューティ比の区間の長さ[sec]
+
+        """
+        self.summary = EventSummary(sample_period, edges, bucket_seconds)
+        self.t0 = t0
+        # 直前のチャンクの最後の値、現在の区間の開始位置、直前のoff→onの位置
+        self._last = None
+        self._run_start = None
+        self._last_on_start = None
+
+    def update(self, chunk: np.ndarray) -> None:
+        """次のチャンクを追加.
+
+        Args:
+            chunk (np.ndarray): 0 (off) / 1 (on) の配列。memmapのスライスでもよい
+
+        """
+        state = np.asarray(chunk, dtype=np.int8)
+        if len(state) == 0:
+            return
+        offset = self.summary.n_samples
+
+        # 状態が変わった位置 (変化後の最初の点の通し番号) と変化後の状態
+        if self._last is None:
+            changes = np.flatnonzero(np.diff(state)) + 1
+        else:
+            changes = np.flatnonzero(np.diff(state, prepend=self._last))
+        new_state = state[changes]
+        changes = changes + offset
+
+        # 開始位置が確定している区間だけを継続時間として数える
+        starts = changes if self._run_start is None else np.concatenate(([self._run_start], changes))
+        lengths = np.diff(starts)
+        finished_state = 1 - new_state[len(new_state) - len(lengths) :]
+        self.summary.add_durations("on", lengths[finished_state == 1])
+        self.summary.add_durations("off", lengths[finished_state == 0])
+
+        # 周期 (off→onから次のoff→onまで)
+        on_starts = changes[new_state == 1]
+        if self._last_on_start is not None:
+            on_starts = np.concatenate(([self._last_on_start], on_starts))
+        self.summary.add_durations("period", np.diff(on_starts))
+
+        if len(changes):
+            self._run_start = int(changes[-1])
+        if len(on_starts):
+            self._last_on_start = int(on_starts[-1])
+        self._last = state[-1]
+
+        self._add_duty(state, offset)
+        self.summary.n_samples += len(state)
+        self.summary.on_samples += int(np.count_nonzero(state))
+
+    def _add_duty(self, state: np.ndarray, offset: int) -> None:
+        """区間ごとのonの点数を reduceat で集計."""
+        period = self.summary.sample_period
+        size = self.summary.bucket_seconds
+        first = int(np.floor((self.t0 + offset * period) / size))
+        last = int(np.floor((self.t0 + (offset + len(state) - 1) * period) / size))
+        ids = np.arange(first, last + 1, dtype=np.int64)
+        # 各区間の最初の点のチャンク内での位置
+        bounds = np.ceil((ids[1:] * size - self.t0) / period - offset).astype(np.int64)
+        starts = np.concatenate(([0], np.clip(bounds, 0, len(state))))
+        keep = np.diff(np.concatenate((starts, [len(state)]))) > 0
+        ids, starts = ids[keep], starts[keep]
+        on = np.add.reduceat(state.astype(np.int64), starts)
+        total = np.diff(np.concatenate((starts, [len(state)])))
+        self.summary.add_buckets(ids, on, total)
+
+
+def summarize(
+    state: np.ndarray,
+    sample_period: float,
+    t0: float = 0.0,
+    chunk_size: int | None = None,
+    edges: np.ndarray = DEFAULT_EDGES,
+    bucket_seconds: float = DEFAULT_BUCKET_SECONDS,
+) -> EventSummary:
+    """1ファイル分の状態の配列を集計.
+
+    Args:
+        state (np.ndarray): 0 (off) / 1 (on) の配列。np.memmapでもよい
+        sample_period (float): サンプリング周期[sec]
+        t0 (float): データ先頭の時刻[sec]
+        chunk_size (int | None): 指定した点数ずつ処理する (memmapのメモリ使用量を抑える)
+        edges (np.ndarray): ヒストグラムのビン境界[sec]
+        bucket_seconds (float): デューティ比の区間の長さ[sec]
+
+    Returns:
+        EventSummary: 集計結果
+
+    """
+    builder = EventStatsBuilder(sample_period, t0, edges, bucket_seconds)
+    step = chunk_size or max(len(state), 1)
+    for start in range(0, len(state), step):
+        builder.update(state[start : start + step])
+    return builder.summary
+
+
+def summarize_analyzer_states(
+    analyzer: object,
+    sample_period: float,
+    t0: float = 0.0,
+    **kwargs: object,
+) -> EventSummary:
+    """StateTransitionAnalyzerの状態の配列 (analyzer.arr) をそのまま集計.
+
+    get_off_to_on_transitions / get_on_to_off_transitions と同じ、最小継続点数で
+    絞り込む前の全ての遷移を使う。絞り込んだ遷移の統計と取り違えないよう、
+    off_to_on_min_duration / on_to_off_min_duration が設定された analyzer は受け付けない。
+
+    Args:
+        analyzer (object): StateTransitionAnalyzerのインスタンス
+        sample_period (float): サンプリング周期[sec]
+        t0 (float): データ先頭の時刻[sec]
+        **kwargs (object): summarize に渡す引数
+
+    Returns:
+        EventSummary: 集計結果
+
+    Raises:
+        ValueError: 最小継続点数が設定されている場合
+
+    """
+    if analyzer.off_to_on_min_duration > 0 or analyzer.on_to_off_min_duration > 0:
+        msg = (
+            "summarize_analyzer_states uses unfiltered transitions; "
+            "create the analyzer without off_to_on_min_duration / on_to_off_min_duration"
+        )
+        raise ValueError(msg)
+    return summarize(analyzer.arr, sample_period, t0, **kwargs)
@@ -1,6 +1,9 @@
 import numpy as np
 
+import profiling
 
+
+@profiling.instrument_class("StateTransitionAnalyzer")
 class StateTransitionAnalyzer:
     def __init__(self, arr, off_to_on_min_duration=0, on_to_off_min_duration=0):
         self.arr = np.array(arr)
@@ -40,7 +43,7 @@ class StateTransitionAnalyzer:
         if self.off_to_on_min_duration > 0:
             transitions = self.get_off_to_on_transitions()
             durations = np.diff(np.concatenate(([0], transitions)))
-            return transitions[durations[:-1] >= self.off_to_on_min_duration]
+            return transitions[durations >= self.off_to_on_min_duration]
         else:
             return self.get_off_to_on_transitions()
 
@@ -77,7 +80,7 @@ class StateTransitionAnalyzer:
         if self.on_to_off_min_duration > 0:
             transitions = self.get_on_to_off_transitions()
             durations = np.diff(np.concatenate(([0], transitions)))
-            return transitions[durations[:-1] >= self.on_to_off_min_duration]
+            return transitions[durations >= self.on_to_off_min_duration]
         else:
             return self.get_on_to_off_transitions()
 
@@ -87,6 +90,7 @@ import pandas as pd
 from scipy.signal import find_peaks
 
 
+@profiling.instrument_class("TransitionAnalyzer")
 class TransitionAnalyzer:
     def __init__(self, arr: [pd.Series | np.ndarray | list]) -> None:
         self.arr = np.array(arr)
@@ -115,7 +119,7 @@ class TransitionAnalyzer:
         if self.off_to_on_min_duration > 0:
             transitions = self.offon_arr()
             durations = np.diff(np.concatenate(([0], transitions)))
-            return transitions[durations[:-1] >= off_duration]
+            return transitions[durations >= off_duration]
         return self.offon_arr()
 
     def onoff_arr(self) -> np.ndarray:
@@ -142,27 +146,51 @@ class TransitionAnalyzer:
         if self.on_to_off_min_duration > 0:
             transitions = self.onoff_arr()
             durations = np.diff(np.concatenate(([0], transitions)))
-            return transitions[durations[:-1] >= self.on_to_off_min_duration]
+            return transitions[durations >= self.on_to_off_min_duration]
         return self.onoff_arr()
 
 
 import numpy as np
-import ruptures as rpt
 
 
-class StateTransitionAnalyzer:
-    def __init__(self, arr, off_to_on_min_duration=0, on_to_off_min_duration=0):
+@profiling.instrument_class("ChangePointAnalyzer")
+class ChangePointAnalyzer:
+    """
+    Change point (ruptures KernelCPD) version of StateTransitionAnalyzer.
+    ruptures is imported only when a transition is computed.
+    Change points are returned with the same index convention as StateTransitionAnalyzer
+    (index i is the last sample before the change) and split into off to on / on to off
+    by whether the mean of the following segment is higher or lower.
+    """
+
+    def __init__(self, arr, off_to_on_min_duration=0, on_to_off_min_duration=0, pen=1):
         self.arr = np.array(arr)
         self.off_to_on_min_duration = off_to_on_min_duration
         self.on_to_off_min_duration = on_to_off_min_duration
+        self.pen = pen
+        self._changes = None
+
+    def _change_points(self):
+        """
+        Returns (indices, directions) of the change points. The fit is done once and reused.
+        """
+        if self._changes is None:
+            import ruptures as rpt
+
+            signal = self.arr.astype(np.float64)
+            bkps = np.asarray(rpt.KernelCPD(kernel="linear").fit(signal).predict(pen=self.pen), dtype=np.int64)
+            # the last breakpoint is len(arr), the end of the last segment
+            bounds = np.concatenate(([0], bkps))
+            means = np.add.reduceat(signal, bounds[:-1]) / np.diff(bounds)
+            self._changes = (bkps[:-1] - 1, np.sign(np.diff(means)))
+        return self._changes
 
     def get_off_to_on_transitions(self):
         """
         Returns the indices where the state changed from off (0) to on (1).
         """
-        algo = rpt.KernelCPD(kernel="linear").fit(self.arr)
-        transitions = algo.predict(pen=1)
-        return transitions
+        indices, directions = self._change_points()
+        return indices[directions > 0]
 
     def get_first_off_to_on_transition(self):
         """
@@ -191,7 +219,7 @@ class StateTransitionAnalyzer:
         if self.off_to_on_min_duration > 0:
             transitions = self.get_off_to_on_transitions()
             durations = np.diff(np.concatenate(([0], transitions)))
-            return transitions[durations[:-1] >= self.off_to_on_min_duration]
+            return transitions[durations >= self.off_to_on_min_duration]
         else:
             return self.get_off_to_on_transitions()
 
@@ -199,9 +227,8 @@ class StateTransitionAnalyzer:
         """
         Returns the indices where the state changed from on (1) to off (0).
         """
-        algo = rpt.KernelCPD(kernel="linear").fit(-self.arr)
-        transitions = algo.predict(pen=1)
-        return transitions
+        indices, directions = self._change_points()
+        return indices[directions < 0]
 
     def get_first_on_to_off_transition(self):
         """
@@ -230,6 +257,100 @@ class StateTransitionAnalyzer:
         if self.on_to_off_min_duration > 0:
             transitions = self.get_on_to_off_transitions()
             durations = np.diff(np.concatenate(([0], transitions)))
-            return transitions[durations[:-1] >= self.on_to_off_min_duration]
+            return transitions[durations >= self.on_to_off_min_duration]
         else:
             return self.get_on_to_off_transitions()
+
+
+def _window_series(state, window, step, first_start, offset):
+    """
+    Returns the series for every window [s, s + window) that fits in state,
+    where s is a global start index (state[0] is at offset) >= first_start and a multiple of step.
+    """
+    starts = np.arange(first_start, offset + len(state) - window + 1, step)
+    local = starts - offset
+    diff = np.diff(state)
+    # cumulative counts so that each window is a difference of two values
+    on_cum = np.concatenate(([0], np.cumsum(state, dtype=np.int64)))
+    off_on_cum = np.concatenate(([0], np.cumsum(diff == 1, dtype=np.int64)))
+    on_off_cum = np.concatenate(([0], np.cumsum(diff == -1, dtype=np.int64)))
+    # a transition at index i (between i and i + 1) is inside the window if s <= i <= s + window - 2
+    return {
+        "start": starts,
+        "off_on": off_on_cum[local + window - 1] - off_on_cum[local],
+        "on_off": on_off_cum[local + window - 1] - on_off_cum[local],
+        "duty_cycle": (on_cum[local + window] - on_cum[local]) / window,
+    }
+
+
+def rolling_state_series(arr, window, step=1):
+    """
+    Returns rolling-window transition counts and on fraction in one linear pass.
+
+    For each window start s (0, step, 2 * step, ...) the result holds
+    "start": s,
+    "off_on" / "on_off": the number of transitions that get_off_to_on_transitions /
+    get_on_to_off_transitions would return for arr[s:s + window],
+    "duty_cycle": the fraction of on samples in arr[s:s + window].
+    Window and step are in samples (e.g. window = round(10 / sample_period) for 10 s windows).
+    """
+    if window < 2 or step < 1:
+        raise ValueError("window must be >= 2 and step must be >= 1")
+    state = np.asarray(arr, dtype=np.int8)
+    return _window_series(state, window, step, 0, 0)
+
+
+def rolling_transition_counts(arr, window, step=1, kind="off_on"):
+    """
+    Returns the window start indices and the number of off to on ("off_on") or
+    on to off ("on_off") transitions in each window.
+    """
+    series = rolling_state_series(arr, window, step)
+    return series["start"], series[kind]
+
+
+def rolling_duty_cycle(arr, window, step=1):
+    """
+    Returns the window start indices and the fraction of on samples in each window.
+    """
+    series = rolling_state_series(arr, window, step)
+    return series["start"], series["duty_cycle"]
+
+
+class RollingStateSeries:
+    """
+    Computes rolling_state_series over data given in chunks (e.g. slices of a memmap).
+    Only the last window - 1 samples are kept between chunks, so the whole capture
+    is processed in one linear pass with memory proportional to the chunk size.
+    """
+
+    def __init__(self, window, step=1):
+        if window < 2 or step < 1:
+            raise ValueError("window must be >= 2 and step must be >= 1")
+        self.window = window
+        self.step = step
+        self.n_samples = 0
+        self._tail = np.empty(0, dtype=np.int8)
+        self._next_start = 0
+
+    def update(self, chunk):
+        """
+        Adds the next chunk and returns the series for the windows completed by it.
+        """
+        state = np.concatenate((self._tail, np.asarray(chunk, dtype=np.int8)))
+        offset = self.n_samples - len(self._tail)
+        series = _window_series(state, self.window, self.step, self._next_start, offset)
+        if len(series["start"]) > 0:
+            self._next_start = series["start"][-1] + self.step
+        self.n_samples += len(chunk)
+        self._tail = state[-(self.window - 1):]
+        return series
+
+
+def iter_rolling_state_series(chunks, window, step=1):
+    """
+    Yields rolling_state_series results for each chunk of an iterable of chunks.
+    """
+    rolling = RollingStateSeries(window, step)
+    for chunk in chunks:
+        yield rolling.update(chunk)
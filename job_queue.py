@@ -0,0 +1,412 @@
+"""SQLiteによるローカルジョブキューとワーカープロセス.
+
+Streamlitのセッションから重い解析をジョブとして登録し、
+別プロセスのワーカーで実行する。外部のブローカーは使わず、
+ジョブの状態はSQLite、結果はpickleファイルで受け渡す。
+
+使い方:
+    python job_queue.py workers -n 4   # ワーカーを4プロセス起動 (manage-streamlit.shから起動)
+    TRIAL_PROFILE=1 python job_queue.py workers -n 4   # 解析処理を計測 (profiling.py を参照)
+    python job_queue.py status         # キューの状態を表示
+
+環境変数:
+    TRIAL_JOB_DB: ジョブDBのパス (既定: .cache/jobs.sqlite3)
+    TRIAL_JOB_WORKERS: ワーカー数の既定値 (既定: 2)
+    TRIAL_JOB_QUEUE_TIMEOUT: ジョブが待機中のまま待つ上限[sec] (既定: 600)
+"""
+
+import argparse
+import multiprocessing
+import os
+import pickle
+import signal
+import sqlite3
+import sys
+import time
+import traceback
+from collections.abc import Callable
+from pathlib import Path
+
+import profiling
+
+DEFAULT_DB_PATH = Path(os.environ.get("TRIAL_JOB_DB", ".cache/jobs.sqlite3"))
+DEFAULT_WORKERS = int(os.environ.get("TRIAL_JOB_WORKERS", "2"))
+# ジョブがないときのポーリング間隔[sec]
+POLL_INTERVAL = 0.5
+# 完了したジョブを保持する時間[sec]
+JOB_TTL = 24 * 60 * 60
+PURGE_INTERVAL = 60 * 60
+# ワーカーの監視プロセスがPIDファイルを更新しない場合に停止とみなすまでの時間[sec]
+HEARTBEAT_TIMEOUT = 10
+# 画面側で待機中のジョブを待つ上限[sec]
+QUEUE_TIMEOUT = float(os.environ.get("TRIAL_JOB_QUEUE_TIMEOUT", "600"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key);
+"""
+
+
+class JobQueue:
+    """SQLiteに保存するジョブキュー.
+
+    プロセスごとに生成して使う (接続をプロセス間で共有しない)。
+
+    Attributes:
+        db_path (Path): ジョブDBのパス
+        result_dir (Path): ジョブ結果のpickleの保存先
+        pid_path (Path): ワーカーの監視プロセスのPIDファイル。動作中は1秒ごとに更新される
+
+    """
+
+    def __init__(self, db_path: str | Path = DEFAULT_DB_PATH) -> None:
+        """初期化処理.
+
+        Args:
+            db_path (str | Path): ジョブDBのパス
+
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.result_dir = self.db_path.parent / "job_results"
+        self.result_dir.mkdir(parents=True, exist_ok=True)
+        self.pid_path = self.db_path.parent / "job_workers.pid"
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """DB接続を閉じる."""
+        self._conn.close()
+
+    def submit(self, key: str, kind: str, payload: dict) -> int:
+        """ジョブを登録.
+
+        同じキーのジョブが待機中・実行中の場合はそのIDを、完了済みの場合は最新のIDを返し、
+        新たには登録しない。失敗したジョブしかない場合は登録し直す。
+
+        Args:
+            key (str): ジョブを識別するキー。result_cache.make_keyの結果を使う
+            kind (str): JOB_HANDLERSに登録された処理の名前
+            payload (dict): 処理に渡す引数
+
+        Returns:
+            int: ジョブID
+
+        """
+        if kind not in JOB_HANDLERS:
+            msg = f"unknown job kind: {kind!r}"
+            raise ValueError(msg)
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                # 待機中・実行中を優先し、なければ最新の完了済みジョブ
+                "SELECT id FROM jobs WHERE key = ? AND status IN (?, ?, ?) ORDER BY status = ?, id DESC LIMIT 1",
+                (key, QUEUED, RUNNING, DONE, DONE),
+            ).fetchone()
+            if row is not None:
+                job_id = row["id"]
+            else:
+                job_id = self._conn.execute(
+                    "INSERT INTO jobs (key, kind, payload, status, created) VALUES (?, ?, ?, ?, ?)",
+                    (key, kind, pickle.dumps(payload), QUEUED, time.time()),
+                ).lastrowid
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def status(self, job_id: int) -> dict | None:
+        """ジョブの状態. 存在しない場合はNone."""
+        row = self._conn.execute(
+            "SELECT id, key, kind, status, worker, error, created, started, finished FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def result(self, job_id: int) -> object:
+        """完了したジョブの結果."""
+        with self._result_path(job_id).open("rb") as f:
+            return pickle.load(f)  # noqa: S301
+
+    def claim(self, worker: str) -> tuple | None:
+        """待機中のジョブを1件取り出して実行中にする.
+
+        Returns:
+            tuple | None: (ジョブID, 処理の名前, 引数)。ジョブがない場合はNone
+
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT id, kind, payload FROM jobs WHERE status = ? ORDER BY id LIMIT 1",
+                (QUEUED,),
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, started = ? WHERE id = ?",
+                    (RUNNING, worker, time.time(), row["id"]),
+                )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return row["id"], row["kind"], pickle.loads(row["payload"])  # noqa: S301
+
+    def complete(self, job_id: int, result: object) -> None:
+        """ジョブの結果を保存して完了にする."""
+        path = self._result_path(job_id)
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
+        self._finish(job_id, DONE, None)
+
+    def fail(self, job_id: int, error: str) -> None:
+        """ジョブを失敗にする."""
+        self._finish(job_id, FAILED, error)
+
+    def cancel(self, job_id: int, error: str) -> bool:
+        """待機中のジョブを失敗にする. 既にワーカーが取り出していた場合は何もしない.
+
+        Returns:
+            bool: 失敗にした場合はTrue
+
+        """
+        return bool(
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ? AND status = ?",
+                (FAILED, error, time.time(), job_id, QUEUED),
+            ).rowcount,
+        )
+
+    def heartbeat(self) -> None:
+        """PIDファイルに自プロセスのPIDを書き、更新日時を進める. ワーカーの監視プロセスが呼ぶ."""
+        self.pid_path.write_text(str(os.getpid()))
+
+    def workers_alive(self, timeout: float = HEARTBEAT_TIMEOUT) -> bool:
+        """ワーカーの監視プロセスが動作しているか.
+
+        PIDの生存確認はGit Bash (MSYSのPID) とPythonでPIDが一致しないため、
+        PIDファイルがtimeout秒以内に更新されているかで判定する。
+        """
+        try:
+            return time.time() - self.pid_path.stat().st_mtime <= timeout
+        except FileNotFoundError:
+            return False
+
+    def counts(self) -> dict:
+        """状態ごとのジョブ数."""
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def depth(self) -> int:
+        """待機中と実行中のジョブ数."""
+        counts = self.counts()
+        return counts[QUEUED] + counts[RUNNING]
+
+    def requeue_running(self) -> int:
+        """実行中のまま残ったジョブを待機中に戻す. ワーカーの起動時に呼ぶ."""
+        return self._conn.execute(
+            "UPDATE jobs SET status = ?, worker = NULL, started = NULL WHERE status = ?",
+            (QUEUED, RUNNING),
+        ).rowcount
+
+    def fail_running(self, worker: str, error: str) -> int:
+        """指定したワーカーが実行中のジョブを失敗にする. ワーカーが異常終了したときに呼ぶ.
+
+        メモリ不足などでワーカーを落とすジョブを待機中に戻すと再起動のたびに繰り返すため、
+        待機中には戻さず失敗にする。
+
+        Returns:
+            int: 失敗にしたジョブ数
+
+        """
+        return self._conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE status = ? AND worker = ?",
+            (FAILED, error, time.time(), RUNNING, worker),
+        ).rowcount
+
+    def purge(self, older_than: float = JOB_TTL) -> int:
+        """完了・失敗から一定時間経過したジョブと結果を削除."""
+        limit = time.time() - older_than
+        rows = self._conn.execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) AND finished < ?",
+            (DONE, FAILED, limit),
+        ).fetchall()
+        for row in rows:
+            self._result_path(row["id"]).unlink(missing_ok=True)
+        self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(row["id"],) for row in rows])
+        return len(rows)
+
+    def _finish(self, job_id: int, status: str, error: str | None) -> None:
+        """ジョブの終了状態を記録."""
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+            (status, error, time.time(), job_id),
+        )
+
+    def _result_path(self, job_id: int) -> Path:
+        """ジョブ結果のpickleのパス."""
+        return self.result_dir / f"{job_id}.pkl"
+
+
+def _load_job_table(payload: dict) -> object:
+    """ジョブの対象ファイルを読み込む. 同じファイルの連続したジョブでは読み込みを省略する."""
+    from pipeline import load_table
+    from result_cache import ResultCache
+
+    global _table_cache  # noqa: PLW0603
+    if _table_cache is None:
+        _table_cache = ResultCache(max_memory_bytes=256 * 1024**2)
+    return _table_cache.get_or_compute(
+        payload["digest"],
+        lambda: load_table(payload["path"], name=payload["name"]),
+    )
+
+
+def run_transitions_job(payload: dict) -> object:
+    """遷移検出のジョブ."""
+    from pipeline import analyze_transitions
+
+    return analyze_transitions(_load_job_table(payload), payload["params"])
+
+
+def run_resample_job(payload: dict) -> object:
+    """リサンプリングのジョブ."""
+    from pipeline import resample_columns
+
+    return resample_columns(_load_job_table(payload), payload["params"])
+
+
+# ジョブの種類 -> 処理 payloadには "path", "name", "digest", "params" を入れる
+JOB_HANDLERS: dict[str, Callable[[dict], object]] = {
+    "transitions": run_transitions_job,
+    "resample": run_resample_job,
+}
+_table_cache = None
+
+
+def worker_loop(db_path: str | Path, worker: str) -> None:
+    """ワーカープロセスの本体. ジョブを取り出して実行し続ける."""
+    # Ctrl+Cは親プロセスが受けて子プロセスを終了させる
+    # fork時に親のSIGTERMハンドラを引き継ぐため、terminateで終了するよう既定に戻す
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    queue = JobQueue(db_path)
+    while True:
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        job_id, kind, payload = job
+        try:
+            result = JOB_HANDLERS[kind](payload)
+        except Exception:  # noqa: BLE001
+            queue.fail(job_id, traceback.format_exc())
+        else:
+            queue.complete(job_id, result)
+        # 終了時にatexitが呼ばれないため、ジョブごとに計測結果を書き出す (無効時は何もしない)
+        profiling.dump()
+
+
+def run_workers(count: int, db_path: str | Path = DEFAULT_DB_PATH) -> None:
+    """ワーカープロセスを起動し、終了したものは再起動しながら監視する.
+
+    SIGTERMまたはCtrl+Cで全ワーカーを終了する。
+    """
+    queue = JobQueue(db_path)
+    requeued = queue.requeue_running()
+    if requeued:
+        print(f"Requeued {requeued} interrupted job(s).", flush=True)
+
+    stopping = False
+
+    def stop(_signum: int, _frame: object) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    workers = [None] * count
+    last_purge = 0.0
+    try:
+        while not stopping:
+            queue.heartbeat()
+            for i, process in enumerate(workers):
+                if process is None or not process.is_alive():
+                    worker = f"{os.getpid()}-{i}"
+                    if process is not None:
+                        error = f"Worker {i} exited with code {process.exitcode}."
+                        failed = queue.fail_running(worker, error)
+                        print(f"{error} Restarting. Failed {failed} running job(s).", flush=True)
+                    process = multiprocessing.Process(
+                        target=worker_loop,
+                        args=(db_path, worker),
+                        name=f"job-worker-{i}",
+                    )
+                    process.start()
+                    workers[i] = process
+            if time.time() - last_purge > PURGE_INTERVAL:
+                queue.purge()
+                last_purge = time.time()
+            time.sleep(1)
+    finally:
+        for process in workers:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in workers:
+            if process is not None:
+                process.join(timeout=5)
+        queue.pid_path.unlink(missing_ok=True)
+        queue.close()
+
+
+def main(argv: list | None = None) -> int:
+    """コマンドラインの処理."""
+    parser = argparse.ArgumentParser(description="Local job queue for the Streamlit app")
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH), help="job database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    workers_parser = sub.add_parser("workers", help="run worker processes")
+    workers_parser.add_argument("-n", "--count", type=int, default=DEFAULT_WORKERS, help="number of workers")
+    sub.add_parser("status", help="show queue status")
+    args = parser.parse_args(argv)
+
+    if args.command == "workers":
+        print(f"Starting {args.count} worker(s) on {args.db}", flush=True)
+        run_workers(args.count, args.db)
+        return 0
+
+    queue = JobQueue(args.db)
+    counts = queue.counts()
+    queue.close()
+    print(" ".join(f"{status}={n}" for status, n in counts.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
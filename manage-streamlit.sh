@@ -4,6 +4,13 @@
 APP_FILE="streamlit_app.py"
 PID_FILE="streamlit.pid"
 LOG_FILE="streamlit.log"
+# ジョブキューのワーカー (job_queue.py)
+WORKER_FILE="job_queue.py"
+WORKER_PID_FILE="workers.pid"
+WORKER_LOG_FILE="workers.log"
+WORKER_COUNT="${TRIAL_JOB_WORKERS:-2}"
+# 実行時メトリクス (service_metrics.py)
+METRICS_SCRIPT="service_metrics.py"
 
 # プロセスが実行中か確認する関数 (Git Bash用)
 is_process_running() {
@@ -14,6 +21,57 @@ is_process_running() {
     ps -p "$1" > /dev/null 2>&1
 }
 
+# ワーカーを起動する関数 (既に起動していれば何もしない)
+start_workers() {
+    if [ -f "$WORKER_PID_FILE" ]; then
+        WORKER_PID=$(cat "$WORKER_PID_FILE")
+        if is_process_running "$WORKER_PID"; then
+            echo "Workers are already running (PID: $WORKER_PID)"
+            return 0
+        fi
+        echo "Stale worker PID file found. Removing it."
+        rm "$WORKER_PID_FILE"
+    fi
+    echo "Starting $WORKER_COUNT job worker(s)..."
+    uv run python "$WORKER_FILE" workers -n "$WORKER_COUNT" > "$WORKER_LOG_FILE" 2>&1 &
+    WORKER_PID=$!
+    echo $WORKER_PID > "$WORKER_PID_FILE"
+    echo "Workers started with PID: $WORKER_PID"
+    echo "Worker log file: $WORKER_LOG_FILE"
+}
+
+# ワーカーを停止する関数 (親プロセスが子プロセスを終了させる)
+stop_workers() {
+    if [ -f "$WORKER_PID_FILE" ]; then
+        WORKER_PID=$(cat "$WORKER_PID_FILE")
+        if is_process_running "$WORKER_PID"; then
+            echo "Stopping workers (PID: $WORKER_PID)..."
+            kill "$WORKER_PID"
+            echo "Workers stopped."
+        else
+            echo "Worker process not found, but PID file exists. Cleaning up."
+        fi
+        rm "$WORKER_PID_FILE"
+    else
+        echo "Workers are not running (PID file not found)."
+    fi
+}
+
+# ワーカーの状態とキューの状態を表示する関数
+show_worker_status() {
+    if [ -f "$WORKER_PID_FILE" ] && is_process_running "$(cat "$WORKER_PID_FILE")"; then
+        echo "Workers are running (PID: $(cat "$WORKER_PID_FILE"), count: $WORKER_COUNT)"
+    else
+        echo "Workers are not running."
+    fi
+    echo "Job queue: $(uv run python "$WORKER_FILE" status 2>/dev/null || echo "unavailable")"
+}
+
+# アプリが書き出したメトリクスを表示する関数
+show_metrics() {
+    uv run python "$METRICS_SCRIPT" show "$@"
+}
+
 case "$1" in
     start)
         if [ -f "$PID_FILE" ]; then
@@ -28,6 +86,7 @@ case "$1" in
             fi
         fi
         
+        start_workers
         echo "Starting Streamlit..."
         # バックグラウンドでStreamlitを起動 (nohupはGit Bash標準ではないため削除)
         # Git Bashウィンドウを閉じるとプロセスが終了する可能性があります
@@ -44,6 +103,7 @@ case "$1" in
         echo "   ./$(basename "$0") show-logs - Show recent logs"
         echo "   ./$(basename "$0") logs      - View live logs"
         echo "   ./$(basename "$0") status    - Check status"
+        echo "   ./$(basename "$0") metrics   - Show runtime metrics"
         echo "   ./$(basename "$0") kill-all  - Force kill all Streamlit processes"
         ;;
     
@@ -56,6 +116,7 @@ case "$1" in
                 kill "$PID"
                 rm "$PID_FILE"
                 echo "Streamlit stopped."
+                stop_workers
                 echo ""
                 echo "Next actions:"
                 echo "   ./$(basename "$0") start     - Start Streamlit again"
@@ -63,9 +124,11 @@ case "$1" in
             else
                 echo "Streamlit process not found, but PID file exists. Cleaning up."
                 rm "$PID_FILE"
+                stop_workers
             fi
         else
             echo "Streamlit is not running (PID file not found)."
+            stop_workers
         fi
         ;;
     
@@ -81,26 +144,42 @@ case "$1" in
             if is_process_running "$PID"; then
                 echo "Streamlit is running (PID: $PID)"
                 echo "Access at: http://localhost:8501"
+                show_worker_status
+                echo ""
+                show_metrics
                 echo ""
                 echo "Available actions:"
                 echo "   ./$(basename "$0") stop      - Stop Streamlit"
                 echo "   ./$(basename "$0") restart   - Restart Streamlit"
                 echo "   ./$(basename "$0") show-logs - Show recent logs"
+                echo "   ./$(basename "$0") metrics   - Show runtime metrics"
             else
                 echo "Streamlit is not running (stale PID file)."
                 rm "$PID_FILE"
+                show_worker_status
                 echo ""
                 echo "Available actions:"
                 echo "   ./$(basename "$0") start     - Start Streamlit"
             fi
         else
             echo "Streamlit is not running."
+            show_worker_status
             echo ""
             echo "Available actions:"
             echo "   ./$(basename "$0") start     - Start Streamlit"
         fi
         ;;
     
+    metrics)
+        # metrics --json で生のJSONを表示
+        shift
+        show_metrics "$@"
+        if [ -n "$TRIAL_METRICS_HISTORY" ] && [ -f "$TRIAL_METRICS_HISTORY" ]; then
+            echo ""
+            echo "History: $TRIAL_METRICS_HISTORY ($(($(wc -l < "$TRIAL_METRICS_HISTORY") - 1)) rows)"
+        fi
+        ;;
+
     logs)
         if [ -f "$LOG_FILE" ]; then
             echo "Showing live logs from '$LOG_FILE' (Press Ctrl+C to exit)..."
@@ -139,24 +218,38 @@ case "$1" in
             echo "All matching processes terminated."
         fi
         
+        echo "Attempting to kill all job worker processes..."
+        WORKER_PIDS_TO_KILL=$(ps -W | grep "$WORKER_FILE" | grep -v "grep" | awk '{print $1}')
+        for PID in $WORKER_PIDS_TO_KILL; do
+            echo "Killing worker process $PID..."
+            kill "$PID"
+        done
+
         # PIDファイルも削除
         if [ -f "$PID_FILE" ]; then
             rm -f "$PID_FILE"
             echo "PID file removed."
         fi
+        rm -f "$WORKER_PID_FILE"
         ;;
     
     *)
-        echo "Usage: $0 {start|stop|restart|status|logs|show-logs|kill-all}"
+        echo "Usage: $0 {start|stop|restart|status|metrics|logs|show-logs|kill-all}"
         echo ""
         echo "Commands:"
-        echo "  start      - Start Streamlit in background"
-        echo "  stop       - Stop Streamlit gracefully"
+        echo "  start      - Start Streamlit and job workers in background"
+        echo "  stop       - Stop Streamlit and job workers gracefully"
         echo "  restart    - Restart Streamlit"
-        echo "  status     - Check Streamlit status"
+        echo "  status     - Check Streamlit, worker and job queue status"
+        echo "  metrics    - Show runtime metrics (RSS, CPU, sessions, latency, cache, queue)"
         echo "  logs       - Show live logs (Ctrl+C to exit)"
         echo "  show-logs  - Show recent logs only"
-        echo "  kill-all   - Force kill all Streamlit processes"
+        echo "  kill-all   - Force kill all Streamlit and worker processes"
+        echo ""
+        echo "Environment:"
+        echo "  TRIAL_JOB_WORKERS - Number of job worker processes (default: 2)"
+        echo "  TRIAL_JOB_QUEUE_TIMEOUT - Seconds the app waits for a queued job before showing an error (default: 600)"
+        echo "  TRIAL_METRICS_HISTORY - CSV file to append periodic metrics to (default: disabled)"
         exit 1
         ;;
 esac
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""遷移検出とリサンプリングの処理パイプライン.
+
+GUIやStreamlitなどのフロントエンドから共通で使う処理をまとめたもの。
+各ステップのパラメータは辞書で受け渡し、そのままキャッシュのキーに使えるようにする。
+"""
+
+import io
+from collections.abc import Callable, Sequence
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from find_triger import ChangePointAnalyzer, StateTransitionAnalyzer
+from resampling import DEFAULT_DST_PERIOD, DEFAULT_SRC_PERIOD, ResamplePlan
+from result_writer import ResultWriter, build_transition_table
+
+SUPPORTED_SUFFIXES = (".csv", ".txt", ".tsv", ".xlsx", ".xls", ".parquet", ".npy")
+
+# 遷移の検出方法 -> 解析クラス "cpd" はrupturesが必要
+DETECTORS = {
+    "diff": StateTransitionAnalyzer,
+    "cpd": ChangePointAnalyzer,
+}
+DEFAULT_TRANSITION_PARAMS = {
+    "state_column": None,
+    "detector": "diff",
+    "threshold": 0.5,
+    "off_to_on_min_duration": 0,
+    "on_to_off_min_duration": 0,
+    "sample_period": DEFAULT_SRC_PERIOD,
+}
+DEFAULT_RESAMPLE_PARAMS = {
+    "columns": None,
+    "src_period": DEFAULT_SRC_PERIOD,
+    "dst_period": DEFAULT_DST_PERIOD,
+    "method": "linear",
+}
+
+
+def load_table(source: str | Path | bytes, name: str | None = None) -> pd.DataFrame:
+    """データファイルを読み込んでDataFrameにする.
+
+    Args:
+        source (str | Path | bytes): ファイルパスまたはアップロードされたファイルの中身
+        name (str | None): sourceがbytesの場合のファイル名。拡張子の判定に使う
+
+    Returns:
+        pd.DataFrame: 読み込んだデータ。npyの場合は列名が "ch0", "ch1", ...
+
+    """
+    suffix = Path(name if name is not None else source).suffix.lower()
+    if suffix not in SUPPORTED_SUFFIXES:
+        msg = f"unsupported file type: {suffix!r}"
+        raise ValueError(msg)
+    buffer = io.BytesIO(source) if isinstance(source, bytes) else source
+
+    if suffix == ".npy":
+        array = np.load(buffer)
+        array = array.reshape(len(array), -1)
+        return pd.DataFrame(array, columns=[f"ch{i}" for i in range(array.shape[1])])
+    if suffix == ".parquet":
+        return pd.read_parquet(buffer)
+    if suffix in (".xlsx", ".xls"):
+        return pd.read_excel(buffer)
+    sep = "\t" if suffix == ".tsv" else None
+    return pd.read_csv(buffer, sep=sep, engine="python" if sep is None else "c")
+
+
+def binarize(values: np.ndarray, threshold: float) -> np.ndarray:
+    """閾値以上を1 (on)、未満を0 (off) に変換."""
+    return (np.asarray(values, dtype=np.float64) >= threshold).astype(np.int8)
+
+
+def analyze_transitions(table: pd.DataFrame, params: dict) -> pd.DataFrame:
+    """状態の列から遷移テーブルを作成.
+
+    Args:
+        table (pd.DataFrame): load_tableで読み込んだデータ
+        params (dict): DEFAULT_TRANSITION_PARAMSと同じキーを持つ辞書
+            "detector" は "diff" (np.diff、既定) または "cpd" (rupturesの変化点検出)
+
+    Returns:
+        pd.DataFrame: build_transition_tableの結果
+
+    """
+    params = {**DEFAULT_TRANSITION_PARAMS, **params}
+    if params["detector"] not in DETECTORS:
+        msg = f"detector must be one of {list(DETECTORS)}, got {params['detector']!r}"
+        raise ValueError(msg)
+    column = params["state_column"] or table.columns[0]
+    analyzer = DETECTORS[params["detector"]](
+        binarize(table[column].to_numpy(), params["threshold"]),
+        off_to_on_min_duration=params["off_to_on_min_duration"],
+        on_to_off_min_duration=params["on_to_off_min_duration"],
+    )
+    return build_transition_table(analyzer, sample_period=params["sample_period"])
+
+
+def resample_columns(table: pd.DataFrame, params: dict) -> dict:
+    """指定した列をリサンプリング.
+
+    Args:
+        table (pd.DataFrame): load_tableで読み込んだデータ
+        params (dict): DEFAULT_RESAMPLE_PARAMSと同じキーを持つ辞書
+
+    Returns:
+        dict: "time" (変換後の時間軸)、"data" ((列数, 点数) の配列)、"columns" (列名のリスト)
+
+    """
+    params = {**DEFAULT_RESAMPLE_PARAMS, **params}
+    columns = list(params["columns"] or table.select_dtypes("number").columns)
+    plan = ResamplePlan(params["src_period"], params["dst_period"], params["method"])
+    data = table[columns].to_numpy(dtype=np.float64).T
+    return {"time": plan.grid(data.shape[-1]), "data": plan.apply(data), "columns": columns}
+
+
+def process_files(  # noqa: PLR0913
+    files: Sequence[str | Path],
+    output_dir: str | Path,
+    transition_params: dict,
+    resample_params: dict | None = None,
+    writer_options: dict | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> pd.DataFrame:
+    """複数のファイルの遷移検出とリサンプリングを行い、結果をまとめて書き出す.
+
+    遷移テーブルは ResultWriter で output_dir の Excel / Parquet に1つにまとめ、
+    リサンプリング結果は ``{通し番号}_{ファイル名}_time.npy`` と ``..._resampled.npy`` に保存する。
+    書き出しはバックグラウンドで行うため、次のファイルの解析と並行して進む。
+
+    Args:
+        files (Sequence[str | Path]): 入力ファイル
+        output_dir (str | Path): 出力先ディレクトリ
+        transition_params (dict): DEFAULT_TRANSITION_PARAMSと同じキーを持つ辞書
+        resample_params (dict | None): DEFAULT_RESAMPLE_PARAMSと同じキーを持つ辞書。Noneの場合はリサンプリングしない
+        writer_options (dict | None): ResultWriterに渡す引数 (excel_name, parquet_name など)
+        progress (Callable[[int, int], None] | None): (完了数, 全体数) を受け取る進捗の通知先
+
+    Returns:
+        pd.DataFrame: ファイルごとの off→on / on→off の件数
+
+    """
+    records = []
+    with ResultWriter(output_dir, **(writer_options or {})) as writer:
+        for done, path in enumerate(files, 1):
+            file_key = str(path)
+            table = load_table(path)
+            transitions = analyze_transitions(table, transition_params)
+            writer.add_transitions(file_key, transitions)
+            if resample_params is not None:
+                resampled = resample_columns(table, resample_params)
+                writer.add_array(file_key, "time", resampled["time"])
+                writer.add_array(file_key, "resampled", resampled["data"])
+            counts = transitions["kind"].value_counts()
+            records.append(
+                {"file": file_key, "off_on": int(counts.get("off_on", 0)), "on_off": int(counts.get("on_off", 0))},
+            )
+            if progress is not None:
+                progress(done, len(files))
+    return pd.DataFrame.from_records(records, columns=["file", "off_on", "on_off"])
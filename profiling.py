@@ -0,0 +1,391 @@
+"""解析・リサンプリング処理の計測 (オプトイン).
+
+環境変数 TRIAL_PROFILE を設定したときだけ、デコレータで指定した関数の
+呼び出し回数、経過時間・CPU時間のヒストグラム、ピークメモリを記録する。
+無効の場合はデコレータが元の関数をそのまま返すため、実行時のコストはない。
+そのため有効にするのは計測対象のモジュールをimportする前 (環境変数か enable()) に行う。
+
+各プロセスは計測結果を TRIAL_PROFILE_DIR/<実行ID>/stats-<pid>-<開始時刻>.json に書き出し、
+report() で1回の実行の全プロセス分をまとめて表示する (既定は最新の実行)。
+実行IDは計測を有効にしたプロセスで作成し、環境変数で子プロセスに引き継ぐため、
+以前の実行の結果や再利用されたPIDの結果が混ざらない。
+
+使い方:
+    TRIAL_PROFILE=1 python job_queue.py workers -n 4
+    python profiling.py report           # 最新の実行の集計結果を表示
+    python profiling.py report --run ID  # 指定した実行の集計結果を表示
+    python profiling.py runs             # 実行IDの一覧
+    python profiling.py report --clear   # 表示後に全ての計測結果を削除
+
+環境変数:
+    TRIAL_PROFILE: "1" で時間とメモリ、"time" で時間のみを計測 (既定: 無効)
+    TRIAL_PROFILE_DIR: 計測結果の保存先 (既定: .cache/profile)
+    TRIAL_PROFILE_CPROFILE: "1" でcProfileも有効にし、profile-<pid>-<開始時刻>.pstats を保存
+    TRIAL_PROFILE_RUN: 実行ID (既定: 計測を有効にしたときに日時とPIDから作成)
+"""
+
+import argparse
+import atexit
+import cProfile
+import functools
+import json
+import math
+import os
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+# ヒストグラムの区間 1usから2倍ずつ (最後の区間は約35分以上)
+N_BUCKETS = 32
+BUCKET_BASE = 1e-6
+PERCENTILES = (50, 90, 99)
+
+_MODE = os.environ.get("TRIAL_PROFILE", "").strip().lower()
+ENABLED = _MODE not in ("", "0", "false", "off")
+TRACE_MEMORY = ENABLED and _MODE != "time"
+PROFILE_DIR = Path(os.environ.get("TRIAL_PROFILE_DIR", ".cache/profile"))
+USE_CPROFILE = os.environ.get("TRIAL_PROFILE_CPROFILE", "") == "1"
+
+
+def _new_run_id() -> str:
+    """日時とPIDから実行IDを作成."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+# 実行ID 有効な場合は環境変数に設定し、以降に起動した子プロセスと共有する
+RUN_ID = os.environ.get("TRIAL_PROFILE_RUN") or None
+if ENABLED and RUN_ID is None:
+    RUN_ID = os.environ["TRIAL_PROFILE_RUN"] = _new_run_id()
+
+_stats = {}
+_stats_lock = threading.Lock()
+_local = threading.local()
+_profiler = None
+_started = False
+# 結果のファイル名に使う (PID, 開始時刻[ns]) forkした子プロセスではPIDが変わるため作り直す
+_process_id = None
+
+
+def enable(
+    memory: bool = True,
+    cprofile: bool = False,
+    profile_dir: str | Path | None = None,
+    run_id: str | None = None,
+) -> None:
+    """計測を有効にする.
+
+    計測対象のモジュール (find_triger, resampling) をimportする前に呼ぶこと。
+    環境変数も設定するため、以降に起動した子プロセスでも有効になる。
+
+    Args:
+        memory (bool): ピークメモリも計測するか
+        cprofile (bool): cProfileも有効にするか
+        profile_dir (str | Path | None): 計測結果の保存先
+        run_id (str | None): 実行ID。Noneの場合は設定済み (環境変数を含む) のID、なければ新しいID
+
+    """
+    global ENABLED, TRACE_MEMORY, USE_CPROFILE, PROFILE_DIR, RUN_ID  # noqa: PLW0603
+    RUN_ID = run_id or RUN_ID or _new_run_id()
+    os.environ["TRIAL_PROFILE_RUN"] = RUN_ID
+    ENABLED = True
+    TRACE_MEMORY = memory
+    USE_CPROFILE = cprofile
+    os.environ["TRIAL_PROFILE"] = "1" if memory else "time"
+    os.environ["TRIAL_PROFILE_CPROFILE"] = "1" if cprofile else ""
+    if profile_dir is not None:
+        PROFILE_DIR = Path(profile_dir)
+        os.environ["TRIAL_PROFILE_DIR"] = str(PROFILE_DIR)
+
+
+def _start() -> None:
+    """プロセス内で最初に計測するときの準備."""
+    global _profiler, _started  # noqa: PLW0603
+    if _started:
+        return
+    _started = True
+    if TRACE_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if USE_CPROFILE:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(dump)
+
+
+def _bucket(seconds: float) -> int:
+    """時間に対応するヒストグラムの区間."""
+    if seconds <= BUCKET_BASE:
+        return 0
+    return min(int(math.log2(seconds / BUCKET_BASE)) + 1, N_BUCKETS - 1)
+
+
+def _record(name: str, wall: float, cpu: float, peak: int | None) -> None:
+    """1回分の計測結果を集計."""
+    with _stats_lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = {
+                "calls": 0,
+                "wall_total": 0.0,
+                "cpu_total": 0.0,
+                "wall_max": 0.0,
+                "wall_hist": [0] * N_BUCKETS,
+                "cpu_hist": [0] * N_BUCKETS,
+                "peak_bytes": None,
+            }
+        stats["calls"] += 1
+        stats["wall_total"] += wall
+        stats["cpu_total"] += cpu
+        stats["wall_max"] = max(stats["wall_max"], wall)
+        stats["wall_hist"][_bucket(wall)] += 1
+        stats["cpu_hist"][_bucket(cpu)] += 1
+        if peak is not None:
+            stats["peak_bytes"] = max(stats["peak_bytes"] or 0, peak)
+
+
+def profiled(name: str) -> Callable[[Callable], Callable]:
+    """関数を計測するデコレータ. 無効の場合は元の関数をそのまま返す.
+
+    Args:
+        name (str): 集計に使う名前 ("resample.linear" など)
+
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args: object, **kwargs: object) -> object:
+            _start()
+            frame = None
+            if TRACE_MEMORY:
+                # 入れ子の呼び出しでreset_peakされても外側のピークを失わないよう、
+                # 呼び出しごとに [開始時の使用量, 内側を含めたピーク] を積む
+                stack = _local.__dict__.setdefault("frames", [])
+                current, peak_so_far = tracemalloc.get_traced_memory()
+                if stack:
+                    stack[-1][1] = max(stack[-1][1], peak_so_far)
+                tracemalloc.reset_peak()
+                frame = [current, current]
+                stack.append(frame)
+            wall_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                cpu = time.thread_time() - cpu_start
+                wall = time.perf_counter() - wall_start
+                peak = None
+                if frame is not None:
+                    stack.pop()
+                    absolute = max(tracemalloc.get_traced_memory()[1], frame[1])
+                    if stack:
+                        stack[-1][1] = max(stack[-1][1], absolute)
+                    peak = absolute - frame[0]
+                _record(name, wall, cpu, peak)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_class(prefix: str) -> Callable[[type], type]:
+    """クラスの公開メソッドを全て計測するクラスデコレータ.
+
+    Args:
+        prefix (str): 集計に使う名前の接頭辞。"{prefix}.{メソッド名}" で集計される
+
+    """
+
+    def decorator(cls: type) -> type:
+        if not ENABLED:
+            return cls
+        for attr, value in list(vars(cls).items()):
+            if callable(value) and not attr.startswith("_"):
+                setattr(cls, attr, profiled(f"{prefix}.{attr}")(value))
+        return cls
+
+    return decorator
+
+
+def _file_id() -> str:
+    """このプロセスの結果のファイル名 (PIDが再利用されても重ならないよう開始時刻を付ける)."""
+    global _process_id  # noqa: PLW0603
+    if _process_id is None or _process_id[0] != os.getpid():
+        _process_id = (os.getpid(), time.time_ns())
+    return f"{_process_id[0]}-{_process_id[1]}"
+
+
+def dump() -> Path | None:
+    """このプロセスの計測結果を書き出す. 無効または未計測の場合は何もしない.
+
+    ワーカープロセスは終了時にatexitが呼ばれないことがあるため、
+    ジョブやファイルの処理ごとに呼び出す。
+    """
+    if not ENABLED or not _started:
+        return None
+    run_dir = PROFILE_DIR / RUN_ID
+    run_dir.mkdir(parents=True, exist_ok=True)
+    file_id = _file_id()
+    with _stats_lock:
+        payload = json.dumps({"pid": os.getpid(), "stats": _stats})
+    path = run_dir / f"stats-{file_id}.json"
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(payload, encoding="utf-8")
+    tmp_path.replace(path)
+    if _profiler is not None:
+        _profiler.dump_stats(run_dir / f"profile-{file_id}.pstats")
+    return path
+
+
+def runs(profile_dir: str | Path | None = None) -> list:
+    """計測結果のある実行IDの一覧 (古い順)."""
+    profile_dir = Path(profile_dir or PROFILE_DIR)
+    if not profile_dir.is_dir():
+        return []
+    run_dirs = [path for path in profile_dir.iterdir() if path.is_dir() and any(path.glob("stats-*.json"))]
+    return [path.name for path in sorted(run_dirs, key=lambda path: path.stat().st_mtime)]
+
+
+def _run_dir(profile_dir: str | Path | None, run: str | None) -> Path | None:
+    """実行の結果のディレクトリ. runを省略した場合は最新の実行 (結果がなければNone)."""
+    profile_dir = Path(profile_dir or PROFILE_DIR)
+    if run is None:
+        all_runs = runs(profile_dir)
+        if not all_runs:
+            return None
+        run = all_runs[-1]
+    return profile_dir / run
+
+
+def merge(profile_dir: str | Path | None = None, run: str | None = None) -> dict:
+    """1回の実行の全プロセスの計測結果を合算.
+
+    Args:
+        profile_dir (str | Path | None): 計測結果の保存先。省略した場合はPROFILE_DIR
+        run (str | None): 実行ID。省略した場合は最新の実行
+
+    """
+    run_dir = _run_dir(profile_dir, run)
+    merged = {}
+    if run_dir is None:
+        return merged
+    for path in sorted(run_dir.glob("stats-*.json")):
+        for name, stats in json.loads(path.read_text(encoding="utf-8"))["stats"].items():
+            total = merged.get(name)
+            if total is None:
+                merged[name] = {**stats, "processes": 1}
+                continue
+            total["processes"] += 1
+            total["calls"] += stats["calls"]
+            total["wall_total"] += stats["wall_total"]
+            total["cpu_total"] += stats["cpu_total"]
+            total["wall_max"] = max(total["wall_max"], stats["wall_max"])
+            total["wall_hist"] = [a + b for a, b in zip(total["wall_hist"], stats["wall_hist"], strict=True)]
+            total["cpu_hist"] = [a + b for a, b in zip(total["cpu_hist"], stats["cpu_hist"], strict=True)]
+            if stats["peak_bytes"] is not None:
+                total["peak_bytes"] = max(total["peak_bytes"] or 0, stats["peak_bytes"])
+    return merged
+
+
+def hist_percentile(hist: list, q: float) -> float:
+    """ヒストグラムからパーセンタイルを求める (区間の上端を返す)."""
+    target = sum(hist) * q / 100
+    count = 0
+    for i, n in enumerate(hist):
+        count += n
+        if count >= target and n:
+            return BUCKET_BASE * 2**i
+    return BUCKET_BASE * 2 ** (len(hist) - 1)
+
+
+def _format_seconds(seconds: float) -> str:
+    """時間を見やすい単位で表示."""
+    if seconds < 1e-3:  # noqa: PLR2004
+        return f"{seconds * 1e6:.0f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
+
+
+def report(profile_dir: str | Path | None = None, top: int = 20, run: str | None = None) -> str:
+    """集計結果を表形式の文字列にする.
+
+    Args:
+        profile_dir (str | Path | None): 計測結果の保存先
+        top (int): cProfileの結果を表示する関数の数
+        run (str | None): 実行ID。省略した場合は最新の実行
+
+    """
+    profile_dir = Path(profile_dir or PROFILE_DIR)
+    run_dir = _run_dir(profile_dir, run)
+    merged = merge(profile_dir, run)
+    if not merged:
+        return f"No profiling data in '{run_dir or profile_dir}'."
+
+    header = ["name", "calls", "procs", "wall total", "wall mean", "cpu total"]
+    header += [f"p{q}<=" for q in PERCENTILES] + ["wall max", "peak mem"]
+    rows = []
+    for name, stats in sorted(merged.items(), key=lambda item: -item[1]["wall_total"]):
+        peak = stats["peak_bytes"]
+        rows.append(
+            [
+                name,
+                str(stats["calls"]),
+                str(stats["processes"]),
+                _format_seconds(stats["wall_total"]),
+                _format_seconds(stats["wall_total"] / stats["calls"]),
+                _format_seconds(stats["cpu_total"]),
+                *(_format_seconds(hist_percentile(stats["wall_hist"], q)) for q in PERCENTILES),
+                _format_seconds(stats["wall_max"]),
+                f"{peak / 1024**2:.1f}MB" if peak is not None else "-",
+            ],
+        )
+    widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+    lines = [f"Run: {run_dir.name}"]
+    lines += ["  ".join(cell.ljust(width) for cell, width in zip(row, widths, strict=True)) for row in [header, *rows]]
+
+    pstats_files = sorted(str(path) for path in run_dir.glob("profile-*.pstats"))
+    if pstats_files:
+        import io
+        import pstats
+
+        stream = io.StringIO()
+        pstats.Stats(*pstats_files, stream=stream).sort_stats("cumulative").print_stats(top)
+        lines += ["", f"cProfile ({len(pstats_files)} process(es)):", stream.getvalue()]
+    return "\n".join(lines)
+
+
+def clear(profile_dir: str | Path | None = None, run: str | None = None) -> None:
+    """計測結果を削除. runを省略した場合は全ての実行."""
+    profile_dir = Path(profile_dir or PROFILE_DIR)
+    run_dirs = [profile_dir / run] if run is not None else [profile_dir / name for name in runs(profile_dir)]
+    for run_dir in run_dirs:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def main(argv: list | None = None) -> int:
+    """コマンドラインの処理."""
+    parser = argparse.ArgumentParser(description="Report profiling data collected with TRIAL_PROFILE")
+    parser.add_argument("command", choices=["report", "runs", "clear"])
+    parser.add_argument("--dir", default=str(PROFILE_DIR), help="profiling data directory")
+    parser.add_argument("--run", help="run id (default: latest run for report, all runs for clear)")
+    parser.add_argument("--top", type=int, default=20, help="number of cProfile entries to show")
+    parser.add_argument("--clear", action="store_true", help="remove profiling data after reporting")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        print(report(args.dir, args.top, args.run))
+    if args.command == "runs":
+        print("\n".join(runs(args.dir)) or f"No profiling data in '{args.dir}'.")
+    if args.command == "clear" or args.clear:
+        clear(args.dir, args.run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
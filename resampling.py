@@ -0,0 +1,167 @@
+"""振動データのリサンプリング.
+
+resampling.md の検討内容を実装したもの。5msec (200Hz) のデータを
+8.192msec (約122Hz) などの別の時間軸へ変換する。
+
+- linear: 線形補間。元データで振動が捉え切れていない場合の推奨
+- spline: 3次スプライン補間。振動周波数がナイキスト周波数未満の場合向け
+- sinc: 帯域制限補間。有理数比のポリフェーズフィルタ (resample_poly) で実装
+"""
+
+from fractions import Fraction
+
+import numpy as np
+from scipy import interpolate, signal
+
+import profiling
+
+DEFAULT_SRC_PERIOD = 0.005
+DEFAULT_DST_PERIOD = 0.008192
+METHODS = ("linear", "spline", "sinc")
+# 周期比を有理数近似するときの分母の上限 (5msec -> 8.192msec は 625/1024)
+MAX_RATIO_DENOMINATOR = 4096
+# 浮動小数点誤差で格子点が1点欠けないための余裕
+_GRID_EPS = 1e-9
+
+
+class ResamplePlan:
+    """リサンプリングの設定と前計算.
+
+    周期比の有理数近似やsinc用のFIRフィルタは生成時に一度だけ計算し、
+    同じ設定で多数のファイルを処理するときに使い回す。
+
+    Attributes:
+        src_period (float): 元データのサンプリング周期[sec]
+        dst_period (float): 変換後のサンプリング周期[sec]
+        method (str): "linear", "spline", "sinc" のいずれか
+        up (int): sinc用のアップサンプリング倍率
+        down (int): sinc用のダウンサンプリング倍率
+        taps (np.ndarray | None): sinc用のFIRフィルタ係数
+
+    """
+
+    def __init__(
+        self,
+        src_period: float = DEFAULT_SRC_PERIOD,
+        dst_period: float = DEFAULT_DST_PERIOD,
+        method: str = "linear",
+    ) -> None:
+        """初期化処理.
+
+        Args:
+            src_period (float): 元データのサンプリング周期[sec]
+            dst_period (float): 変換後のサンプリング周期[sec]
+            method (str): 補間方法
+
+        """
+        if method not in METHODS:
+            msg = f"method must be one of {METHODS}, got {method!r}"
+            raise ValueError(msg)
+        if src_period <= 0 or dst_period <= 0:
+            msg = "sampling periods must be positive"
+            raise ValueError(msg)
+        self.src_period = src_period
+        self.dst_period = dst_period
+        self.method = method
+
+        ratio = Fraction(src_period / dst_period).limit_denominator(MAX_RATIO_DENOMINATOR)
+        self.up, self.down = ratio.numerator, ratio.denominator
+        self.taps = None
+        if method == "sinc":
+            # resample_polyの既定と同じ設計 (カットオフ 1/max_rate, kaiser窓)
+            max_rate = max(self.up, self.down)
+            self.taps = signal.firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+
+    def output_length(self, n_samples: int) -> int:
+        """n_samples点のデータを変換したときの点数."""
+        if n_samples == 0:
+            return 0
+        if self.method == "sinc":
+            return -(-n_samples * self.up // self.down)
+        span = (n_samples - 1) * self.src_period
+        return int(np.floor(span / self.dst_period + _GRID_EPS)) + 1
+
+    def grid(self, n_samples: int, t0: float = 0.0) -> np.ndarray:
+        """変換後の時間軸[sec]."""
+        return t0 + np.arange(self.output_length(n_samples)) * self.dst_period
+
+    def apply(self, data: np.ndarray, axis: int = -1) -> np.ndarray:
+        """データを変換.
+
+        Args:
+            data (np.ndarray): 元データ。axis方向が時間
+            axis (int): 時間軸
+
+        Returns:
+            np.ndarray: 変換後のデータ
+
+        """
+        data = np.asarray(data, dtype=np.float64)
+        return _APPLY[self.method](self, data, axis)
+
+
+@profiling.profiled("resample.linear")
+def _apply_linear(plan: ResamplePlan, data: np.ndarray, axis: int) -> np.ndarray:
+    """線形補間."""
+    n_samples = data.shape[axis]
+    t_original = np.arange(n_samples) * plan.src_period
+    return interpolate.interp1d(t_original, data, kind="linear", axis=axis)(plan.grid(n_samples))
+
+
+@profiling.profiled("resample.spline")
+def _apply_spline(plan: ResamplePlan, data: np.ndarray, axis: int) -> np.ndarray:
+    """3次スプライン補間."""
+    n_samples = data.shape[axis]
+    t_original = np.arange(n_samples) * plan.src_period
+    return interpolate.CubicSpline(t_original, data, axis=axis)(plan.grid(n_samples))
+
+
+@profiling.profiled("resample.sinc")
+def _apply_sinc(plan: ResamplePlan, data: np.ndarray, axis: int) -> np.ndarray:
+    """ポリフェーズフィルタによる帯域制限補間."""
+    return signal.resample_poly(data, plan.up, plan.down, axis=axis, window=plan.taps)
+
+
+# 補間方法 -> 処理 計測 (profiling) で方法ごとに集計できるよう関数を分けている
+_APPLY = {"linear": _apply_linear, "spline": _apply_spline, "sinc": _apply_sinc}
+
+
+def map_indices(
+    indices: np.ndarray,
+    src_period: float = DEFAULT_SRC_PERIOD,
+    dst_period: float = DEFAULT_DST_PERIOD,
+) -> np.ndarray:
+    """別のサンプリング周期の時間軸での最も近いインデックスに変換.
+
+    Args:
+        indices (np.ndarray): 元の時間軸でのインデックス (遷移の位置など)
+        src_period (float): 元の時間軸のサンプリング周期[sec]
+        dst_period (float): 変換先の時間軸のサンプリング周期[sec]
+
+    Returns:
+        np.ndarray: 変換先の時間軸でのインデックス
+
+    """
+    return np.rint(np.asarray(indices, dtype=np.float64) * (src_period / dst_period)).astype(np.int64)
+
+
+def resample(
+    data: np.ndarray,
+    src_period: float = DEFAULT_SRC_PERIOD,
+    dst_period: float = DEFAULT_DST_PERIOD,
+    method: str = "linear",
+) -> tuple[np.ndarray, np.ndarray]:
+    """データを別のサンプリング周期に変換.
+
+    Args:
+        data (np.ndarray): 元データ。最後の軸が時間
+        src_period (float): 元データのサンプリング周期[sec]
+        dst_period (float): 変換後のサンプリング周期[sec]
+        method (str): "linear", "spline", "sinc" のいずれか
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: 変換後の時間軸[sec]と変換後のデータ
+
+    """
+    plan = ResamplePlan(src_period, dst_period, method)
+    return plan.grid(np.shape(data)[-1]), plan.apply(data)
@@ -0,0 +1,301 @@
+"""解析結果のサーバー側キャッシュ.
+
+ファイルの内容ハッシュと解析パラメータをキーとして結果を保持する。
+メモリとディスクの2段構成で、それぞれ容量の上限を超えると
+最も長く使われていないもの (LRU) から追い出す。
+メモリから追い出された結果はディスクに退避される。
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_MEMORY_BYTES = 512 * 1024**2
+DEFAULT_MAX_DISK_BYTES = 2 * 1024**3
+_HASH_CHUNK_SIZE = 1024**2
+
+
+def file_digest(source: str | Path | bytes) -> str:
+    """ファイル内容のハッシュ値を計算.
+
+    Args:
+        source (str | Path | bytes): ファイルパスまたはファイルの中身
+
+    Returns:
+        str: sha256の16進文字列
+
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, bytes | bytearray | memoryview):
+        digest.update(source)
+    else:
+        with Path(source).open("rb") as f:
+            while chunk := f.read(_HASH_CHUNK_SIZE):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(digest: str, step: str, params: dict) -> str:
+    """キャッシュのキーを作成.
+
+    Args:
+        digest (str): file_digestの結果
+        step (str): 処理の名前 ("transitions", "resample" など)
+        params (dict): 処理のパラメータ。JSONに変換できること
+
+    Returns:
+        str: キー
+
+    """
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(f"{digest}:{step}:{payload}".encode()).hexdigest()
+
+
+def estimate_size(value: object) -> int:
+    """キャッシュする値のおおよそのメモリ使用量[byte]."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, list | tuple):
+        return sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """容量制限付きLRUキャッシュ (メモリ + ディスク).
+
+    複数のセッションから同時に使われる前提で、操作はロックで保護する。
+    ディスクの読み書きはロックの外で行い、大きな値の退避中も他のキーの操作を止めない。
+    同じキーの計算が同時に要求された場合は1回だけ計算し、他は結果を待つ。
+
+    Attributes:
+        max_memory_bytes (int): メモリ上に保持する上限[byte]
+        disk_dir (Path | None): ディスクキャッシュの保存先。Noneの場合はメモリのみ
+        max_disk_bytes (int): ディスク上に保持する上限[byte]
+        hits (int): ヒット数
+        misses (int): ミス数
+
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+        disk_dir: str | Path | None = None,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+    ) -> None:
+        """初期化処理.
+
+        Args:
+            max_memory_bytes (int): メモリ上に保持する上限[byte]
+            disk_dir (str | Path | None): ディスクキャッシュの保存先
+            max_disk_bytes (int): ディスク上に保持する上限[byte]
+
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir is not None else None
+        self.hits = 0
+        self.misses = 0
+
+        # キー -> (値, サイズ) 先頭が最も古い
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        # キー -> サイズ 先頭が最も古い
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        # ディスクの読み込み・書き込み中のキー -> 完了を通知するEvent
+        self._io = {}
+
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    def get(self, key: str, default: object = None) -> object:
+        """キーに対応する値を取得. ディスクにあればメモリに戻す.
+
+        ディスクの読み込みはロックの外で行い、他のキーの取得を止めない。
+        同じキーを読み込み中・退避中の場合は完了を待つ。
+        """
+        while True:
+            with self._lock:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return self._memory[key][0]
+                event = self._io.get(key)
+                if event is None:
+                    if key not in self._disk:
+                        self.misses += 1
+                        return default
+                    # ディスクのエントリを索引から外して読み込みを予約する
+                    self._disk_bytes -= self._disk.pop(key)
+                    event = self._io[key] = threading.Event()
+                    break
+            event.wait()
+
+        path = self._disk_path(key)
+        missing = object()
+        try:
+            with path.open("rb") as f:
+                value = pickle.load(f)  # noqa: S301
+        except (OSError, pickle.UnpicklingError, EOFError):
+            value = missing
+        path.unlink(missing_ok=True)
+
+        with self._lock:
+            self._io.pop(key).set()
+            if value is missing:
+                self.misses += 1
+                return default
+            self.hits += 1
+            spills = self._put_memory(key, value) if key not in self._memory else []
+        self._spill(spills)
+        return value
+
+    def put(self, key: str, value: object) -> None:
+        """値を保存."""
+        with self._lock:
+            spills = self._put_memory(key, value)
+        self._spill(spills)
+
+    def get_or_compute(self, key: str, func: Callable[[], object]) -> object:
+        """キャッシュにあれば返し、なければ計算して保存.
+
+        Args:
+            key (str): make_keyで作成したキー
+            func (Callable[[], object]): 値を計算する関数
+
+        Returns:
+            object: キャッシュされた値または計算結果
+
+        """
+        missing = object()
+        while True:
+            value = self.get(key, missing)
+            if value is not missing:
+                return value
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    break
+            # 他のセッションが計算中なので終わるのを待ってから再取得する
+            event.wait()
+
+        try:
+            value = func()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def stats(self) -> dict:
+        """キャッシュの統計情報."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def clear(self) -> None:
+        """全てのエントリを削除."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for key in list(self._disk):
+                self._drop_disk(key)
+
+    def _put_memory(self, key: str, value: object) -> list:
+        """メモリに保存し、上限を超えた分を追い出す (ロック取得済みで呼ぶ).
+
+        上限より大きい値は保存した値自体も追い出す。
+
+        Returns:
+            list: ディスクに退避する (キー, 値) のリスト。ロックを解放してから_spillに渡す
+
+        """
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1]
+        if key in self._disk:
+            self._drop_disk(key)
+        size = estimate_size(value)
+        self._memory[key] = (value, size)
+        self._memory_bytes += size
+        spills = []
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            old_key, (old_value, old_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= old_size
+            if self.disk_dir is not None and old_key not in self._io:
+                # 書き込みが終わるまで同じキーの取得を待たせる
+                self._io[old_key] = threading.Event()
+                spills.append((old_key, old_value))
+        return spills
+
+    def _spill(self, spills: list) -> None:
+        """メモリから追い出した値をディスクに保存 (ロックを取得せずに呼ぶ)."""
+        for key, value in spills:
+            path = self._disk_path(key)
+            tmp_path = path.with_suffix(".tmp")
+            try:
+                with tmp_path.open("wb") as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                tmp_path.replace(path)
+                size = path.stat().st_size
+            except (OSError, pickle.PicklingError):
+                tmp_path.unlink(missing_ok=True)
+                size = None
+
+            with self._lock:
+                self._io.pop(key).set()
+                if size is None:
+                    continue
+                if key in self._memory or key in self._disk:
+                    # 書き込み中に同じキーが保存し直された
+                    path.unlink(missing_ok=True)
+                    continue
+                self._disk[key] = size
+                self._disk_bytes += size
+                while self._disk_bytes > self.max_disk_bytes and self._disk:
+                    self._drop_disk(next(iter(self._disk)))
+
+    def _drop_disk(self, key: str) -> None:
+        """ディスクのエントリを削除 (ロック取得済みで呼ぶ)."""
+        self._disk_bytes -= self._disk.pop(key, 0)
+        self._disk_path(key).unlink(missing_ok=True)
+
+    def _disk_path(self, key: str) -> Path:
+        """キーに対応するディスク上のファイル."""
+        return self.disk_dir / f"{key}.pkl"
+
+    def _load_disk_index(self) -> None:
+        """再起動時に既存のディスクキャッシュを更新日時の古い順に読み込む."""
+        paths = sorted(self.disk_dir.glob("*.pkl"), key=os.path.getmtime)
+        for path in paths:
+            size = path.stat().st_size
+            self._disk[path.stem] = size
+            self._disk_bytes += size
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            self._drop_disk(next(iter(self._disk)))
@@ -0,0 +1,248 @@
+"""解析結果の一括書き出し.
+
+ファイルごとの遷移テーブルとリサンプリング後の配列をバッファに溜め、
+まとめてバックグラウンドスレッドで書き出す。
+
+- Excel: 終了時に1シートにつき1回の ``DataFrame.to_excel`` で書き出す
+- Parquet: バッファが ``flush_rows`` 行に達するたびに1 row group として追記
+- 配列: ``.npy`` としてそのまま保存
+"""
+
+import queue
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Excelの1シートあたりの最大行数 (ヘッダー行を除く)
+EXCEL_MAX_ROWS = 1_048_575
+DEFAULT_FLUSH_ROWS = 100_000
+DEFAULT_SHEET_NAME = "transitions"
+
+
+def build_transition_table(analyzer: object, sample_period: float | None = None) -> pd.DataFrame:
+    """StateTransitionAnalyzerから遷移テーブルを作成.
+
+    Args:
+        analyzer (object): StateTransitionAnalyzerのインスタンス
+        sample_period (float | None): サンプリング周期[sec]。指定時はtime列を追加
+
+    Returns:
+        pd.DataFrame: kind ("off_on" / "on_off") と index の列を持つテーブル
+
+    """
+    off_on = np.asarray(analyzer.get_off_to_on_transitions_after_min_duration(), dtype=np.int64)
+    on_off = np.asarray(analyzer.get_on_to_off_transitions_after_min_duration(), dtype=np.int64)
+    index = np.concatenate((off_on, on_off))
+    kind = np.repeat(np.array(["off_on", "on_off"]), (len(off_on), len(on_off)))
+    order = np.argsort(index, kind="stable")
+    table = pd.DataFrame({"kind": kind[order], "index": index[order]})
+    if sample_period is not None:
+        table["time"] = table["index"].to_numpy() * sample_period
+    return table
+
+
+class ResultWriter:
+    """遷移テーブルと配列をバッファリングして一括で書き出すクラス.
+
+    書き込みは専用スレッドで行うため、呼び出し側は次のファイルの計算を続けられる。
+    ``with`` 文で使用し、終了時に残りのバッファとExcelを書き出す。
+
+    Attributes:
+        output_dir (Path): 出力先ディレクトリ
+        excel_path (Path | None): Excelの出力先。Noneの場合は書き出さない
+        parquet_path (Path | None): Parquetの出力先。Noneの場合は書き出さない
+
+    """
+
+    def __init__(
+        self,
+        output_dir: str | Path,
+        excel_name: str | None = "transitions.xlsx",
+        parquet_name: str | None = "transitions.parquet",
+        flush_rows: int = DEFAULT_FLUSH_ROWS,
+        max_pending: int = 4,
+    ) -> None:
+        """初期化処理.
+
+        Args:
+            output_dir (str | Path): 出力先ディレクトリ
+            excel_name (str | None): Excelファイル名。Noneで無効
+            parquet_name (str | None): Parquetファイル名。Noneで無効
+            flush_rows (int): Parquetの1 row groupあたりの行数の目安
+            max_pending (int): 書き込み待ちのジョブ数の上限。超えると呼び出し側が待つ
+
+        """
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.excel_path = self.output_dir / excel_name if excel_name else None
+        self.parquet_path = self.output_dir / parquet_name if parquet_name else None
+        self.flush_rows = flush_rows
+
+        # Parquet用の未書き出しバッファとExcel用の全テーブル
+        self._pending_tables = []
+        self._pending_rows = 0
+        self._excel_tables = []
+        self._parquet_writer = None
+        # file_key -> 配列のファイル名の通し番号、保存済みの配列のパス
+        self._array_ids = {}
+        self._array_paths = set()
+        self._closed = False
+
+        # 書き込みスレッド
+        self._error = None
+        self._jobs = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="ResultWriter", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "ResultWriter":
+        """with文の開始."""
+        return self
+
+    def __exit__(self, exc_type: type | None, exc: BaseException | None, tb: object) -> None:
+        """with文の終了時に残りを書き出す."""
+        self.close()
+
+    def add_transitions(self, file_key: str, table: pd.DataFrame) -> None:
+        """1ファイル分の遷移テーブルを追加.
+
+        Args:
+            file_key (str): 元データファイルを識別する名前。file列として付与される
+            table (pd.DataFrame): 遷移テーブル
+
+        """
+        self._check_open()
+        table = table.assign(file=file_key)
+        if self.excel_path is not None:
+            self._excel_tables.append(table)
+        if self.parquet_path is not None:
+            self._pending_tables.append(table)
+            self._pending_rows += len(table)
+            if self._pending_rows >= self.flush_rows:
+                self._flush_parquet()
+
+    def add_array(self, file_key: str, name: str, array: np.ndarray) -> None:
+        """リサンプリング後の配列などを追加. ``{通し番号}_{ファイル名}_{name}.npy`` として保存される.
+
+        通し番号はfile_keyごとに振るため、別のディレクトリの同じ名前のファイルも上書きしない。
+        書き出しは後で行うため配列はコピーして渡す (呼び出し側は同じバッファを再利用してよい)。
+
+        Args:
+            file_key (str): 元データファイルを識別する名前
+            name (str): 配列の名前
+            array (np.ndarray): 保存する配列
+
+        Raises:
+            ValueError: 同じfile_keyとnameの配列が追加済みの場合
+
+        """
+        self._check_open()
+        number = self._array_ids.setdefault(file_key, len(self._array_ids))
+        path = self.output_dir / f"{number:05d}_{Path(file_key).stem}_{name}.npy"
+        if path in self._array_paths:
+            msg = f"array {name!r} of {file_key!r} has already been added"
+            raise ValueError(msg)
+        self._array_paths.add(path)
+        self._submit(np.save, path, np.array(array, copy=True))
+
+    def flush(self) -> None:
+        """Parquetのバッファを書き出し、書き込みスレッドの完了を待つ."""
+        self._check_open()
+        self._flush_parquet()
+        self._jobs.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """残りのバッファとExcelを書き出してスレッドを終了."""
+        if self._closed:
+            return
+        try:
+            self._flush_parquet()
+            if self.excel_path is not None and self._excel_tables:
+                tables = self._excel_tables
+                self._excel_tables = []
+                self._submit(self._write_excel, tables)
+            self._submit(self._close_parquet)
+        finally:
+            self._closed = True
+            self._jobs.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def _check_open(self) -> None:
+        """close後の呼び出しと書き込みスレッドのエラーを検出."""
+        if self._closed:
+            msg = "ResultWriter is already closed"
+            raise RuntimeError(msg)
+        self._raise_error()
+
+    def _raise_error(self) -> None:
+        """書き込みスレッドで発生した例外を呼び出し側で再送出."""
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _submit(self, func: object, *args: object) -> None:
+        """書き込みジョブをスレッドに渡す."""
+        self._jobs.put((func, args))
+
+    def _flush_parquet(self) -> None:
+        """溜まったテーブルを結合して1 row groupとして書き出す."""
+        if not self._pending_tables:
+            return
+        table = pd.concat(self._pending_tables, ignore_index=True)
+        self._pending_tables = []
+        self._pending_rows = 0
+        self._submit(self._write_parquet, table)
+
+    def _run(self) -> None:
+        """書き込みスレッドの本体."""
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is None:
+                    return
+                func, args = job
+                # エラー発生後のジョブは実行しない
+                if self._error is None:
+                    func(*args)
+            except Exception as e:  # noqa: BLE001
+                self._error = e
+            finally:
+                self._jobs.task_done()
+
+    def _write_parquet(self, table: pd.DataFrame) -> None:
+        """Parquetに1 row groupを追記 (書き込みスレッドで実行)."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.parquet_path, arrow_table.schema)
+        else:
+            arrow_table = arrow_table.cast(self._parquet_writer.schema)
+        self._parquet_writer.write_table(arrow_table, row_group_size=len(arrow_table))
+
+    def _close_parquet(self) -> None:
+        """Parquetのフッターを書き込んで閉じる (書き込みスレッドで実行)."""
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def _write_excel(self, tables: list) -> None:
+        """全テーブルを結合してシート単位で一括書き出し (書き込みスレッドで実行).
+
+        行数がExcelの上限を超える場合は ``transitions_2`` のようにシートを分割する。
+        """
+        table = pd.concat(tables, ignore_index=True)
+        columns = ["file"] + [c for c in table.columns if c != "file"]
+        table = table[columns]
+        with pd.ExcelWriter(self.excel_path) as writer:
+            for n, start in enumerate(range(0, max(len(table), 1), EXCEL_MAX_ROWS), 1):
+                sheet_name = DEFAULT_SHEET_NAME if n == 1 else f"{DEFAULT_SHEET_NAME}_{n}"
+                table.iloc[start : start + EXCEL_MAX_ROWS].to_excel(
+                    writer,
+                    sheet_name=sheet_name,
+                    index=False,
+                )
@@ -0,0 +1,301 @@
+"""Streamlitサービスの実行時メトリクス.
+
+アプリのプロセス内でバックグラウンドスレッドが定期的にスナップショットを
+JSONファイルに書き出し、manage-streamlit.sh の status / metrics から表示する。
+環境変数で指定した場合はCSVに履歴を追記し、負荷と遅延の関係を後から確認できるようにする。
+
+使い方:
+    python service_metrics.py show    # 最新のスナップショットを表示
+
+環境変数:
+    TRIAL_METRICS_FILE: スナップショットの出力先 (既定: streamlit_metrics.json)
+    TRIAL_METRICS_INTERVAL: スナップショットの更新間隔[sec] (既定: 5)
+    TRIAL_METRICS_HISTORY: 履歴CSVの出力先。未指定の場合は履歴を残さない
+    TRIAL_METRICS_HISTORY_INTERVAL: 履歴CSVへの追記間隔[sec] (既定: 60)
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from pathlib import Path
+
+METRICS_FILE = Path(os.environ.get("TRIAL_METRICS_FILE", "streamlit_metrics.json"))
+METRICS_INTERVAL = float(os.environ.get("TRIAL_METRICS_INTERVAL", "5"))
+HISTORY_FILE = os.environ.get("TRIAL_METRICS_HISTORY")
+HISTORY_INTERVAL = float(os.environ.get("TRIAL_METRICS_HISTORY_INTERVAL", "60"))
+# この時間アクセスのないセッションは非アクティブとみなす[sec]
+SESSION_TIMEOUT = 300
+# 遅延のパーセンタイル計算に使う直近の件数
+LATENCY_WINDOW = 1000
+PERCENTILES = (50, 90, 99)
+# 履歴CSVの列 途中で列が変わらないよう固定する
+HISTORY_COLUMNS = [
+    "timestamp",
+    "rss_bytes",
+    "cpu_user",
+    "cpu_system",
+    "active_sessions",
+    *(f"latency.{name}.p{q}" for name in ("request", "analysis") for q in PERCENTILES),
+    "cache.hit_ratio",
+    "cache.memory_bytes",
+    "cache.disk_bytes",
+    "queue.queued",
+    "queue.running",
+]
+
+
+def percentile(values: list, q: float) -> float | None:
+    """ソート済みのリストのパーセンタイル (線形補間)."""
+    if not values:
+        return None
+    pos = (len(values) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
+
+
+def process_usage() -> dict:
+    """自プロセスのメモリ使用量とCPU時間.
+
+    psutilがあれば使い、なければ /proc から読む (取得できない場合はNone)。
+    """
+    times = os.times()
+    usage = {"rss_bytes": None, "cpu_user": times.user, "cpu_system": times.system}
+    try:
+        import psutil
+    except ImportError:
+        status = Path("/proc/self/status")
+        if status.exists():
+            for line in status.read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    usage["rss_bytes"] = int(line.split()[1]) * 1024
+                    break
+    else:
+        usage["rss_bytes"] = psutil.Process().memory_info().rss
+    return usage
+
+
+class MetricsRecorder:
+    """メトリクスを集計し、定期的にファイルへ書き出すクラス.
+
+    Attributes:
+        path (Path): スナップショットの出力先
+        interval (float): スナップショットの更新間隔[sec]
+        history_path (Path | None): 履歴CSVの出力先
+        history_interval (float): 履歴CSVへの追記間隔[sec]
+
+    """
+
+    def __init__(
+        self,
+        path: str | Path = METRICS_FILE,
+        interval: float = METRICS_INTERVAL,
+        history_path: str | Path | None = HISTORY_FILE,
+        history_interval: float = HISTORY_INTERVAL,
+    ) -> None:
+        """初期化処理.
+
+        Args:
+            path (str | Path): スナップショットの出力先
+            interval (float): スナップショットの更新間隔[sec]
+            history_path (str | Path | None): 履歴CSVの出力先。Noneで無効
+            history_interval (float): 履歴CSVへの追記間隔[sec]
+
+        """
+        self.path = Path(path)
+        self.interval = interval
+        self.history_path = Path(history_path) if history_path else None
+        self.history_interval = history_interval
+        self.started = time.time()
+
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._counts = {}
+        self._sessions = {}
+        self._sources = {}
+        self._last_history = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "MetricsRecorder":
+        """書き出しスレッドを開始."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="MetricsRecorder", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """書き出しスレッドを停止."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def observe(self, name: str, seconds: float) -> None:
+        """処理時間を記録.
+
+        Args:
+            name (str): 処理の名前 ("request", "analysis" など)
+            seconds (float): 処理時間[sec]
+
+        """
+        with self._lock:
+            if name not in self._latencies:
+                self._latencies[name] = deque(maxlen=LATENCY_WINDOW)
+                self._counts[name] = 0
+            self._latencies[name].append(seconds)
+            self._counts[name] += 1
+
+    def touch_session(self, session_id: str) -> None:
+        """セッションのアクセスを記録."""
+        with self._lock:
+            self._sessions[session_id] = time.time()
+
+    def add_source(self, name: str, func: Callable[[], dict]) -> None:
+        """スナップショットに含める外部の値を登録.
+
+        Args:
+            name (str): スナップショット内のキー
+            func (Callable[[], dict]): 値を返す関数。書き出しスレッドから呼ばれる
+
+        """
+        with self._lock:
+            self._sources[name] = func
+
+    def snapshot(self) -> dict:
+        """現在のメトリクス."""
+        now = time.time()
+        with self._lock:
+            # タイムアウトしたセッションを削除
+            for session_id, last_seen in list(self._sessions.items()):
+                if now - last_seen > SESSION_TIMEOUT:
+                    del self._sessions[session_id]
+            latencies = {name: sorted(values) for name, values in self._latencies.items()}
+            counts = dict(self._counts)
+            active_sessions = len(self._sessions)
+            sources = dict(self._sources)
+
+        snapshot = {
+            "timestamp": now,
+            "pid": os.getpid(),
+            "uptime": now - self.started,
+            **process_usage(),
+            "active_sessions": active_sessions,
+            "latency": {
+                name: {
+                    "count": counts[name],
+                    **{f"p{q}": percentile(values, q) for q in PERCENTILES},
+                }
+                for name, values in latencies.items()
+            },
+        }
+        for name, func in sources.items():
+            try:
+                snapshot[name] = func()
+            except Exception as e:  # noqa: BLE001
+                snapshot[name] = {"error": str(e)}
+        return snapshot
+
+    def write(self) -> dict:
+        """スナップショットを書き出し、必要であれば履歴CSVに追記."""
+        snapshot = self.snapshot()
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(snapshot, indent=2), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+        if self.history_path is not None and snapshot["timestamp"] - self._last_history >= self.history_interval:
+            self._append_history(snapshot)
+            self._last_history = snapshot["timestamp"]
+        return snapshot
+
+    def _append_history(self, snapshot: dict) -> None:
+        """履歴CSVに1行追記. ネストした値は "latency.request.p90" のような列名に展開する."""
+        row = flatten(snapshot)
+        new_file = not self.history_path.exists()
+        with self.history_path.open("a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=HISTORY_COLUMNS, restval="", extrasaction="ignore")
+            if new_file:
+                writer.writeheader()
+            writer.writerow(row)
+
+    def _run(self) -> None:
+        """書き出しスレッドの本体."""
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Failed to write metrics: {e}", file=sys.stderr)
+
+
+def flatten(data: dict, prefix: str = "") -> dict:
+    """ネストした辞書を "a.b.c" 形式のキーの辞書に展開."""
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def format_snapshot(snapshot: dict) -> str:
+    """スナップショットを表示用の文字列にする."""
+    age = time.time() - snapshot["timestamp"]
+    taken = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot["timestamp"]))
+    rss = snapshot.get("rss_bytes")
+    lines = [
+        f"Snapshot:        {taken} ({age:.0f}s ago, PID {snapshot['pid']}, up {snapshot['uptime'] / 60:.1f} min)",
+        f"RSS:             {rss / 1024**2:.1f} MB" if rss is not None else "RSS:             unavailable",
+        f"CPU time:        user {snapshot['cpu_user']:.1f}s / system {snapshot['cpu_system']:.1f}s",
+        f"Active sessions: {snapshot['active_sessions']}",
+    ]
+    for name, stats in snapshot.get("latency", {}).items():
+        values = " ".join(
+            f"p{q}={stats[f'p{q}'] * 1000:.0f}ms" for q in PERCENTILES if stats.get(f"p{q}") is not None
+        )
+        lines.append(f"Latency {name + ':':<8} {values} (n={stats['count']})")
+
+    cache = snapshot.get("cache")
+    if cache and "hit_ratio" in cache:
+        memory_mb = cache["memory_bytes"] / 1024**2
+        disk_mb = cache["disk_bytes"] / 1024**2
+        lines.append(
+            f"Cache:           hit ratio {cache['hit_ratio']:.1%} ({cache['hits']} hits / {cache['misses']} misses), "
+            f"{memory_mb:.1f} MB in memory, {disk_mb:.1f} MB on disk",
+        )
+    queue = snapshot.get("queue")
+    if queue and "queued" in queue:
+        counts = " ".join(f"{status}={n}" for status, n in queue.items())
+        lines.append(f"Job queue:       {counts}")
+
+    if age > 3 * METRICS_INTERVAL:
+        lines.append("Warning: snapshot is stale. The app may not be running or may be unresponsive.")
+    return "\n".join(lines)
+
+
+def main(argv: list | None = None) -> int:
+    """コマンドラインの処理."""
+    parser = argparse.ArgumentParser(description="Show runtime metrics of the Streamlit app")
+    parser.add_argument("command", choices=["show"], help="show the latest snapshot")
+    parser.add_argument("--file", default=str(METRICS_FILE), help="metrics snapshot path")
+    parser.add_argument("--json", action="store_true", help="print raw JSON")
+    args = parser.parse_args(argv)
+
+    path = Path(args.file)
+    if not path.exists():
+        print(f"Metrics file '{path}' not found.")
+        return 1
+    snapshot = json.loads(path.read_text(encoding="utf-8"))
+    print(json.dumps(snapshot, indent=2) if args.json else format_snapshot(snapshot))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
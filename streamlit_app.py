@@ -0,0 +1,359 @@
+"""遷移検出・リサンプリングのStreamlitフロントエンド.
+
+manage-streamlit.sh から起動する。解析結果はファイルの内容ハッシュと
+パラメータをキーとしてサーバー側でキャッシュし、全セッションで共有する。
+キャッシュにない解析は job_queue のワーカープロセスで実行し、完了を待って表示する。
+ワーカーが動作していない場合や、ジョブが待機中のまま TRIAL_JOB_QUEUE_TIMEOUT を超えた場合は
+エラーを表示して待つのをやめる。
+
+環境変数:
+    TRIAL_DATA_DIR: サーバー側のデータファイルを置くディレクトリ (既定: data)
+    TRIAL_CACHE_DIR: ディスクキャッシュの保存先 (既定: .cache/results)
+    TRIAL_CACHE_MEMORY_MB: メモリキャッシュの上限[MB] (既定: 512)
+    TRIAL_CACHE_DISK_MB: ディスクキャッシュの上限[MB] (既定: 2048)
+    TRIAL_UPLOAD_DIR: アップロードされたファイルの保存先 (既定: .cache/uploads)
+    TRIAL_JOB_DB: ジョブDBのパス (既定: .cache/jobs.sqlite3)
+    TRIAL_JOB_QUEUE_TIMEOUT: ジョブが待機中のまま待つ上限[sec] (既定: 600)
+    TRIAL_METRICS_*: 実行時メトリクスの設定 (service_metrics.py を参照)
+"""
+
+import os
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from job_queue import (
+    DEFAULT_DB_PATH,
+    FAILED,
+    HEARTBEAT_TIMEOUT,
+    POLL_INTERVAL,
+    QUEUE_TIMEOUT,
+    QUEUED,
+    RUNNING,
+    JobQueue,
+)
+from pipeline import DETECTORS, SUPPORTED_SUFFIXES, load_table
+from resampling import DEFAULT_DST_PERIOD, DEFAULT_SRC_PERIOD, METHODS
+from result_cache import ResultCache, file_digest, make_key
+from service_metrics import MetricsRecorder
+
+DATA_DIR = Path(os.environ.get("TRIAL_DATA_DIR", "data"))
+CACHE_DIR = Path(os.environ.get("TRIAL_CACHE_DIR", ".cache/results"))
+CACHE_MEMORY_MB = int(os.environ.get("TRIAL_CACHE_MEMORY_MB", "512"))
+CACHE_DISK_MB = int(os.environ.get("TRIAL_CACHE_DISK_MB", "2048"))
+UPLOAD_DIR = Path(os.environ.get("TRIAL_UPLOAD_DIR", ".cache/uploads"))
+DETECTOR_LABELS = {"diff": "状態の変化 (np.diff)", "cpd": "変化点検出 (ruptures KernelCPD)"}
+# グラフに描画する最大点数 これを超える場合は間引いて表示する
+MAX_CHART_POINTS = 5000
+
+
+@st.cache_resource
+def get_cache() -> ResultCache:
+    """全セッションで共有するキャッシュ."""
+    return ResultCache(
+        max_memory_bytes=CACHE_MEMORY_MB * 1024**2,
+        disk_dir=CACHE_DIR,
+        max_disk_bytes=CACHE_DISK_MB * 1024**2,
+    )
+
+
+def queue_counts() -> dict:
+    """ジョブキューの状態ごとのジョブ数. メトリクスの書き出しスレッドから呼ばれる."""
+    queue = JobQueue(DEFAULT_DB_PATH)
+    try:
+        return queue.counts()
+    finally:
+        queue.close()
+
+
+@st.cache_resource
+def get_metrics() -> MetricsRecorder:
+    """全セッションで共有するメトリクス. manage-streamlit.sh status / metrics で表示する."""
+    metrics = MetricsRecorder()
+    metrics.add_source("cache", get_cache().stats)
+    metrics.add_source("queue", queue_counts)
+    return metrics.start()
+
+
+@st.cache_data(max_entries=1024)
+def server_file_digest(path: str, mtime_ns: int, size: int) -> str:  # noqa: ARG001
+    """サーバー側ファイルのハッシュ. 更新日時とサイズが同じ間は再計算しない."""
+    return file_digest(path)
+
+
+def list_server_files() -> list:
+    """サーバー側のデータファイルの一覧."""
+    if not DATA_DIR.is_dir():
+        return []
+    return sorted(
+        str(path.relative_to(DATA_DIR))
+        for path in DATA_DIR.rglob("*")
+        if path.suffix.lower() in SUPPORTED_SUFFIXES
+    )
+
+
+def select_source() -> tuple:
+    """サイドバーでデータの入力元を選択.
+
+    Returns:
+        tuple: (ファイル名, ファイルパス, ハッシュ値)。未選択の場合はNone
+            アップロードされたファイルはワーカーから読めるようにUPLOAD_DIRに保存する
+
+    """
+    st.sidebar.header("データ")
+    mode = st.sidebar.radio("入力元", ["アップロード", "サーバー上のファイル"])
+    if mode == "アップロード":
+        uploaded = st.sidebar.file_uploader("データファイル", type=[s[1:] for s in SUPPORTED_SUFFIXES])
+        if uploaded is None:
+            return None
+        content = uploaded.getvalue()
+        digest = file_digest(content)
+        path = UPLOAD_DIR / f"{digest}{Path(uploaded.name).suffix.lower()}"
+        if not path.exists():
+            UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(content)
+            tmp_path.replace(path)
+        return uploaded.name, path, digest
+
+    files = list_server_files()
+    if not files:
+        st.sidebar.info(f"{DATA_DIR} にデータファイルがありません")
+        return None
+    name = st.sidebar.selectbox("データファイル", files)
+    path = DATA_DIR / name
+    stat = path.stat()
+    return name, path, server_file_digest(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def transition_params_form(table: pd.DataFrame) -> dict:
+    """サイドバーで遷移検出のパラメータを入力."""
+    st.sidebar.header("遷移検出")
+    columns = list(table.columns)
+    return {
+        "state_column": st.sidebar.selectbox("状態の列", columns),
+        "detector": st.sidebar.selectbox(
+            "検出方法",
+            list(DETECTORS),
+            format_func=DETECTOR_LABELS.get,
+        ),
+        "threshold": st.sidebar.slider("閾値", 0.0, 1.0, 0.5, 0.01),
+        "off_to_on_min_duration": st.sidebar.number_input("off→on 最小継続点数", 0, step=1),
+        "on_to_off_min_duration": st.sidebar.number_input("on→off 最小継続点数", 0, step=1),
+        "sample_period": st.sidebar.number_input(
+            "サンプリング周期[sec]",
+            value=DEFAULT_SRC_PERIOD,
+            format="%.6f",
+        ),
+    }
+
+
+def resample_params_form(table: pd.DataFrame, sample_period: float) -> dict:
+    """サイドバーでリサンプリングのパラメータを入力."""
+    st.sidebar.header("リサンプリング")
+    numeric = list(table.select_dtypes("number").columns)
+    return {
+        "columns": st.sidebar.multiselect("振動データの列", numeric, default=numeric[1:2]),
+        "src_period": sample_period,
+        "dst_period": st.sidebar.number_input(
+            "変換後の周期[sec]",
+            value=DEFAULT_DST_PERIOD,
+            format="%.6f",
+        ),
+        "method": st.sidebar.selectbox("補間方法", METHODS),
+    }
+
+
+def decimate_for_chart(frame: pd.DataFrame) -> pd.DataFrame:
+    """グラフ表示用に点数を間引く."""
+    step = max(1, len(frame) // MAX_CHART_POINTS)
+    return frame.iloc[::step]
+
+
+def stalled_error(queue: JobQueue, status: dict) -> str | None:
+    """待機中・実行中のジョブが完了する見込みがない場合のエラーメッセージ.
+
+    ワーカーの監視プロセスが動作していない場合と、待機中のまま QUEUE_TIMEOUT を超えた場合。
+    待機中のジョブは失敗にして、次の実行で登録し直されるようにする。
+
+    Returns:
+        str | None: エラーメッセージ。待ち続けてよい場合はNone
+
+    """
+    waiting = time.time() - status["created"]
+    # ワーカーの起動直後はPIDファイルがまだ書かれていないことがあるため、HEARTBEAT_TIMEOUT の間は待つ
+    if waiting > HEARTBEAT_TIMEOUT and not queue.workers_alive():
+        error = "ジョブのワーカーが動作していません。manage-streamlit.sh start で起動してください。"
+    elif status["status"] == QUEUED and waiting > QUEUE_TIMEOUT:
+        error = f"ジョブが{QUEUE_TIMEOUT:.0f}秒以上待機したままです。manage-streamlit.sh status で状態を確認してください。"
+    else:
+        return None
+    if status["status"] == QUEUED and not queue.cancel(status["id"], error):
+        # 直前にワーカーが取り出した
+        return None
+    return error
+
+
+def run_step(  # noqa: PLR0913
+    cache: ResultCache,
+    queue: JobQueue,
+    metrics: MetricsRecorder,
+    kind: str,
+    source: tuple,
+    params: dict,
+) -> object:
+    """解析ステップの結果を取得. キャッシュになければジョブを登録する.
+
+    Args:
+        cache (ResultCache): 共有キャッシュ
+        queue (JobQueue): ジョブキュー
+        metrics (MetricsRecorder): 完了したジョブの待ち時間と実行時間を記録する
+        kind (str): ジョブの種類 ("transitions" または "resample")
+        source (tuple): select_sourceの結果
+        params (dict): ステップのパラメータ
+
+    Returns:
+        object: 結果。ジョブが完了していない場合はNone
+
+    Raises:
+        RuntimeError: ジョブが失敗した場合、またはワーカーが動作せず完了する見込みがない場合
+
+    """
+    name, path, digest = source
+    key = make_key(digest, kind, params)
+    missing = object()
+    value = cache.get(key, missing)
+    if value is not missing:
+        return value
+
+    # 登録済みのジョブはIDで状態だけを確認し、ポーリングのたびに登録し直さない
+    jobs = st.session_state.setdefault("jobs", {})
+    status = queue.status(jobs[key]) if key in jobs else None
+    # このセッションが完了を待った (または今回登録した) ジョブだけ時間を記録する
+    waited = status is not None
+    submitted = time.time()
+    if status is None:
+        # 同じキーのジョブが待機中・実行中・完了済みであれば、そのジョブのIDが返る
+        payload = {"path": str(path), "name": name, "digest": digest, "params": params}
+        jobs[key] = queue.submit(key, kind, payload)
+        status = queue.status(jobs[key])
+    if status["status"] in (QUEUED, RUNNING):
+        error = stalled_error(queue, status)
+        if error is None:
+            return None
+        del jobs[key]
+        raise RuntimeError(error)
+    del jobs[key]
+    if status["status"] == FAILED:
+        raise RuntimeError(status["error"])
+    value = queue.result(status["id"])
+    cache.put(key, value)
+    if waited or status["created"] >= submitted:
+        metrics.observe("queue_wait", status["started"] - status["created"])
+        metrics.observe("analysis", status["finished"] - status["started"])
+    return value
+
+
+def show_transitions(name: str, transitions: pd.DataFrame) -> None:
+    """遷移テーブルを表示."""
+    st.subheader(f"遷移 ({name})")
+    counts = transitions["kind"].value_counts()
+    col1, col2 = st.columns(2)
+    col1.metric("off→on", int(counts.get("off_on", 0)))
+    col2.metric("on→off", int(counts.get("on_off", 0)))
+    st.dataframe(transitions, use_container_width=True)
+    st.download_button(
+        "遷移テーブルをCSVで保存",
+        transitions.to_csv(index=False).encode("utf-8"),
+        file_name=f"{Path(name).stem}_transitions.csv",
+        mime="text/csv",
+    )
+
+
+def main() -> None:
+    """画面の構築. 1回の実行にかかった時間をrequestの遅延として記録する.
+
+    ジョブの完了を待つポーリングの再実行は、ユーザーの操作による実行ではないため記録しない。
+    """
+    metrics = get_metrics()
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    metrics.touch_session(st.session_state.session_id)
+    polling = st.session_state.pop("polling", False)
+    start = time.perf_counter()
+    try:
+        pending = render(metrics)
+    finally:
+        if not polling:
+            metrics.observe("request", time.perf_counter() - start)
+
+    # ジョブの完了をポーリングする
+    if pending:
+        time.sleep(POLL_INTERVAL)
+        st.session_state.polling = True
+        st.rerun()
+
+
+def render(metrics: MetricsRecorder) -> bool:
+    """画面の構築.
+
+    Returns:
+        bool: 完了を待っているジョブがある場合はTrue
+
+    """
+    st.set_page_config(page_title="データ処理アプリケーション", layout="wide")
+    st.title("遷移検出・リサンプリング")
+    cache = get_cache()
+
+    source = select_source()
+    if source is None:
+        st.info("サイドバーからデータファイルを選択してください")
+        return False
+    name, path, digest = source
+
+    try:
+        table = cache.get_or_compute(
+            make_key(digest, "load", {"name": Path(name).suffix}),
+            lambda: load_table(path, name=name),
+        )
+    except Exception as e:  # noqa: BLE001
+        st.error(f"ファイルの読み込み中にエラーが発生しました: {e}")
+        return False
+
+    transition_params = transition_params_form(table)
+    resample_params = resample_params_form(table, transition_params["sample_period"])
+
+    # ステップごとにキャッシュするため、閾値を動かしてもリサンプリングは再計算されない
+    queue = JobQueue(DEFAULT_DB_PATH)
+    try:
+        transitions = run_step(cache, queue, metrics, "transitions", source, transition_params)
+        resampled = None
+        if resample_params["columns"]:
+            resampled = run_step(cache, queue, metrics, "resample", source, resample_params)
+    except Exception as e:  # noqa: BLE001
+        st.error(f"解析中にエラーが発生しました: {e}")
+        return False
+    finally:
+        queue.close()
+
+    pending = transitions is None or (resample_params["columns"] and resampled is None)
+    if pending:
+        st.info("解析を実行中です。完了すると自動で表示されます。")
+
+    if transitions is not None:
+        show_transitions(name, transitions)
+    if resampled is not None:
+        st.subheader("リサンプリング結果")
+        chart = pd.DataFrame(resampled["data"].T, columns=resampled["columns"], index=resampled["time"])
+        st.line_chart(decimate_for_chart(chart))
+
+    with st.sidebar.expander("キャッシュ"):
+        st.json(cache.stats())
+
+    return bool(pending)
+
+
+main()
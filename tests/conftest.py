@@ -0,0 +1,6 @@
+"""テストの共通設定. リポジトリ直下のモジュールをimportできるようにする."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,31 @@
+"""batch_resample のテスト."""
+
+import numpy as np
+
+from batch_resample import MANIFEST_NAME, batch_resample
+from resampling import ResamplePlan
+
+
+def test_batch_resample(tmp_path):
+    path = tmp_path / "input.npy"
+    data = np.random.default_rng(0).normal(size=(1000, 2))
+    np.save(path, data)
+    plan = ResamplePlan(method="linear")
+
+    manifest = batch_resample([path, path], tmp_path / "out", plan, max_workers=2)
+
+    assert manifest["file"].tolist() == [str(path), str(path)]
+    assert manifest["error"].isna().all()
+    assert manifest.loc[0, "output"] != manifest.loc[1, "output"]
+    for output in manifest["output"]:
+        resampled = np.load(output, mmap_mode="r")
+        assert resampled.shape == (2, plan.output_length(len(data)))
+        np.testing.assert_allclose(resampled, plan.apply(data.T))
+    assert (tmp_path / "out" / MANIFEST_NAME).exists()
+
+
+def test_batch_resample_no_files(tmp_path):
+    manifest = batch_resample([], tmp_path / "out")
+    assert manifest.empty
+    assert "error" in manifest.columns
+    assert (tmp_path / "out" / MANIFEST_NAME).exists()
@@ -0,0 +1,99 @@
+"""epochs のテスト."""
+
+import numpy as np
+import pytest
+
+from epochs import Epochs, extract_epochs
+
+
+@pytest.fixture
+def data():
+    return np.arange(200, dtype=np.float64).reshape(2, 100)
+
+
+def reference(data, triggers, pre, post):
+    return np.stack([data[:, t - pre : t + post] for t in triggers])
+
+
+def test_array_matches_slices(data):
+    triggers = [10, 25, 60, 80]
+    epochs = Epochs(data, triggers, 10, 20)
+    assert epochs.shape == (4, 2, 30)
+    np.testing.assert_array_equal(epochs.array(), reference(data, triggers, 10, 20))
+    np.testing.assert_array_equal(epochs[1], data[:, 15:45])
+    assert np.shares_memory(epochs[1], data)
+
+
+def test_view_requires_even_spacing(data):
+    epochs = Epochs(data, [10, 30, 50], 10, 20)
+    view = epochs.view()
+    assert np.shares_memory(view, data)
+    np.testing.assert_array_equal(view, epochs.array())
+    with pytest.raises(ValueError, match="evenly spaced"):
+        Epochs(data, [10, 30, 60], 10, 20).view()
+
+
+def test_mean_var(data):
+    triggers = np.array([10, 25, 40, 55, 70])
+    epochs = Epochs(data, triggers, 10, 20)
+    mean, var = epochs.mean_var(batch_size=2, ddof=1)
+    expected = reference(data, triggers, 10, 20)
+    np.testing.assert_allclose(mean, expected.mean(axis=0))
+    np.testing.assert_allclose(var, expected.var(axis=0, ddof=1))
+
+
+def test_drop_out_of_range(data):
+    epochs = Epochs(data, [-50, 5, 50, 95, 150], 10, 20, edge="drop")
+    np.testing.assert_array_equal(epochs.triggers, [50])
+
+
+def test_clip(data):
+    epochs = Epochs(data, [5, 95], 10, 20, edge="clip")
+    np.testing.assert_array_equal(epochs.array(), np.stack([data[:, 0:30], data[:, 70:100]]))
+    for trigger in (-50, 100):
+        with pytest.raises(ValueError, match="triggers must be in"):
+            Epochs(data, [trigger], 10, 20, edge="clip")
+
+
+def test_pad(data):
+    epochs = Epochs(data, [0, 5, 95, 99], 10, 20, edge="pad")
+    windows = epochs.array()
+    np.testing.assert_array_equal(windows[1, :, 5:], data[:, 0:25])
+    assert np.isnan(windows[1, :, :5]).all()
+    np.testing.assert_array_equal(windows[2, :, :15], data[:, 85:100])
+    assert np.isnan(windows[2, :, 15:]).all()
+    mean, _ = epochs.mean_var()
+    assert not np.isnan(mean).any()
+    for trigger in (-50, -1, 100, 150):
+        with pytest.raises(ValueError, match="triggers must be in"):
+            Epochs(data, [trigger], 10, 20, edge="pad")
+
+
+def test_pad_copies_only_edge_windows(data):
+    epochs = Epochs(data, [5, 50, 95], 10, 20, edge="pad")
+    assert epochs.data is data
+    assert np.shares_memory(epochs[1], data)
+    assert not np.shares_memory(epochs[0], data)
+    assert epochs._edge_windows.shape == (2, 2, 30)
+    windows = epochs.array()
+    np.testing.assert_array_equal(windows[1], data[:, 40:70])
+    np.testing.assert_array_equal(epochs.array(np.array([2, 1])), windows[[2, 1]])
+    with pytest.raises(ValueError, match="padded"):
+        epochs.view()
+
+
+def test_pad_window_longer_than_data():
+    data = np.arange(10, dtype=np.int16)
+    epochs = Epochs(data, [3], 10, 20, edge="pad")
+    window = epochs.array()[0, 0]
+    assert window.dtype == np.float64
+    np.testing.assert_array_equal(window[7:17], data)
+    assert np.isnan(window[:7]).all()
+    assert np.isnan(window[17:]).all()
+    with pytest.raises(ValueError, match="longer than the data"):
+        Epochs(data, [3], 10, 20, edge="clip")
+
+
+def test_extract_epochs_maps_indices(data):
+    epochs = extract_epochs(data, [50, 100], 10, 20, src_period=0.005, dst_period=0.008192)
+    np.testing.assert_array_equal(epochs.triggers, [31, 61])
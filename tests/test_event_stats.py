@@ -0,0 +1,74 @@
+"""event_stats のテスト."""
+
+import numpy as np
+import pytest
+
+from event_stats import EventSummary, summarize, summarize_analyzer_states
+from find_triger import StateTransitionAnalyzer
+
+
+def runs(state):
+    """状態の配列を (状態, 長さ) の区間に分ける (先頭と末尾の区間を含む)."""
+    changes = np.flatnonzero(np.diff(state)) + 1
+    bounds = np.concatenate(([0], changes, [len(state)]))
+    return state[bounds[:-1]], np.diff(bounds), changes
+
+
+@pytest.fixture
+def state():
+    rng = np.random.default_rng(0)
+    return np.repeat(np.tile([0, 1], 50), rng.integers(1, 40, size=100)).astype(np.int8)
+
+
+def test_summarize_matches_runs(state):
+    summary = summarize(state, sample_period=0.5, bucket_seconds=100.0)
+    values, lengths, changes = runs(state)
+    inner_values, inner_lengths = values[1:-1], lengths[1:-1]
+    on = inner_lengths[inner_values == 1] * 0.5
+    off = inner_lengths[inner_values == 0] * 0.5
+    period = np.diff(changes[state[changes] == 1]) * 0.5
+
+    for kind, expected in (("on", on), ("off", off), ("period", period)):
+        assert summary.count[kind] == len(expected)
+        assert summary.mean(kind) == pytest.approx(expected.mean())
+        assert summary.std(kind) == pytest.approx(expected.std())
+        assert summary.minimum[kind] == expected.min()
+        assert summary.maximum[kind] == expected.max()
+    assert summary.duty_cycle() == pytest.approx(state.mean())
+    starts, duty = summary.duty_cycle_series()
+    buckets = np.arange(len(state)) * 0.5 // 100
+    np.testing.assert_allclose(duty, [state[buckets == b].mean() for b in np.unique(buckets)])
+    np.testing.assert_array_equal(starts, np.unique(buckets) * 100)
+
+
+def test_chunks_and_merge_match_single_pass(state, tmp_path):
+    whole = summarize(state, sample_period=0.5).describe()
+    chunked = summarize(state, sample_period=0.5, chunk_size=7).describe()
+    assert chunked["duty_cycle"] == pytest.approx(whole["duty_cycle"])
+    for kind in ("on", "off", "period"):
+        assert chunked[kind] == pytest.approx(whole[kind])
+
+    half = len(state) // 2
+    first = summarize(state[:half], sample_period=0.5)
+    second = summarize(state[half:], sample_period=0.5, t0=half * 0.5)
+    first.save(tmp_path / "first.npz")
+    merged = EventSummary.merge_all([EventSummary.load(tmp_path / "first.npz"), second])
+    assert merged.n_samples == len(state)
+    assert merged.on_samples == int(state.sum())
+    assert merged.duty_cycle() == pytest.approx(state.mean())
+    # ファイルの境界をまたぐ区間は数えない
+    for kind in ("on", "off"):
+        assert merged.count[kind] <= whole[kind]["count"]
+
+
+def test_merge_rejects_different_settings():
+    with pytest.raises(ValueError, match="cannot merge"):
+        EventSummary(0.5).merge(EventSummary(1.0))
+
+
+def test_summarize_analyzer_states(state):
+    analyzer = StateTransitionAnalyzer(state)
+    summary = summarize_analyzer_states(analyzer, sample_period=0.5)
+    assert summary.count["period"] == len(analyzer.get_off_to_on_transitions()) - 1
+    with pytest.raises(ValueError, match="unfiltered"):
+        summarize_analyzer_states(StateTransitionAnalyzer(state, off_to_on_min_duration=3), sample_period=0.5)
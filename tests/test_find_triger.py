@@ -0,0 +1,78 @@
+"""find_triger のローリング集計のテスト."""
+
+import numpy as np
+import pytest
+
+from find_triger import (
+    RollingStateSeries,
+    StateTransitionAnalyzer,
+    iter_rolling_state_series,
+    rolling_duty_cycle,
+    rolling_state_series,
+    rolling_transition_counts,
+)
+
+WINDOW = 37
+
+
+@pytest.fixture
+def state():
+    return (np.random.default_rng(0).random(500) < 0.4).astype(np.int8)
+
+
+def brute_force(state, window, step):
+    """各窓の切り出しに StateTransitionAnalyzer を適用した結果."""
+    starts = np.arange(0, len(state) - window + 1, step)
+    off_on, on_off, duty = [], [], []
+    for s in starts:
+        analyzer = StateTransitionAnalyzer(state[s : s + window])
+        off_on.append(len(analyzer.get_off_to_on_transitions()))
+        on_off.append(len(analyzer.get_on_to_off_transitions()))
+        duty.append(state[s : s + window].mean())
+    return {"start": starts, "off_on": np.array(off_on), "on_off": np.array(on_off), "duty_cycle": np.array(duty)}
+
+
+def assert_series_equal(actual, expected):
+    np.testing.assert_array_equal(actual["start"], expected["start"])
+    np.testing.assert_array_equal(actual["off_on"], expected["off_on"])
+    np.testing.assert_array_equal(actual["on_off"], expected["on_off"])
+    np.testing.assert_allclose(actual["duty_cycle"], expected["duty_cycle"])
+
+
+def concat(series_list):
+    return {key: np.concatenate([series[key] for series in series_list]) for key in series_list[0]}
+
+
+@pytest.mark.parametrize("step", [1, 4])
+def test_rolling_state_series_matches_slices(state, step):
+    assert_series_equal(rolling_state_series(state, WINDOW, step), brute_force(state, WINDOW, step))
+
+    starts, counts = rolling_transition_counts(state, WINDOW, step, kind="on_off")
+    np.testing.assert_array_equal(counts, brute_force(state, WINDOW, step)["on_off"])
+    starts, duty = rolling_duty_cycle(state, WINDOW, step)
+    np.testing.assert_allclose(duty, brute_force(state, WINDOW, step)["duty_cycle"])
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 36, 37, 100])
+@pytest.mark.parametrize("step", [1, 4])
+def test_chunked_matches_single_pass(state, chunk_size, step):
+    chunks = [state[i : i + chunk_size] for i in range(0, len(state), chunk_size)]
+    chunked = concat(list(iter_rolling_state_series(chunks, WINDOW, step)))
+    assert_series_equal(chunked, rolling_state_series(state, WINDOW, step))
+
+
+def test_window_longer_than_data(state):
+    series = rolling_state_series(state[:10], WINDOW)
+    assert all(len(values) == 0 for values in series.values())
+
+    rolling = RollingStateSeries(WINDOW)
+    assert len(rolling.update(state[:10])["start"]) == 0
+    assert rolling.n_samples == 10
+
+
+@pytest.mark.parametrize(("window", "step"), [(1, 1), (0, 1), (10, 0)])
+def test_invalid_window_or_step(window, step):
+    with pytest.raises(ValueError, match="window must be >= 2"):
+        rolling_state_series(np.zeros(10), window, step)
+    with pytest.raises(ValueError, match="window must be >= 2"):
+        RollingStateSeries(window, step)
@@ -0,0 +1,100 @@
+"""job_queue のテスト."""
+
+import os
+import time
+
+import pytest
+
+from job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+PAYLOAD = {"path": "data.csv", "name": "data.csv", "digest": "abc", "params": {}}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    yield queue
+    queue.close()
+
+
+def test_submit_deduplicates_active_job(queue):
+    first = queue.submit("key", "transitions", PAYLOAD)
+    assert queue.submit("key", "transitions", PAYLOAD) == first
+    assert queue.submit("other", "transitions", PAYLOAD) != first
+    assert queue.counts()[QUEUED] == 2
+
+
+def test_submit_returns_finished_job(queue):
+    job_id = queue.submit("key", "transitions", PAYLOAD)
+    claimed_id, kind, payload = queue.claim("worker-0")
+    assert (claimed_id, kind, payload) == (job_id, "transitions", PAYLOAD)
+    assert queue.submit("key", "transitions", PAYLOAD) == job_id
+    queue.complete(job_id, {"value": 1})
+
+    assert queue.submit("key", "transitions", PAYLOAD) == job_id
+    assert queue.status(job_id)["status"] == DONE
+    assert queue.result(job_id) == {"value": 1}
+    assert queue.counts()[DONE] == 1
+    assert queue.claim("worker-0") is None
+
+
+def test_submit_retries_failed_job(queue):
+    job_id = queue.submit("key", "transitions", PAYLOAD)
+    queue.claim("worker-0")
+    queue.fail(job_id, "error")
+    retry_id = queue.submit("key", "transitions", PAYLOAD)
+    assert retry_id != job_id
+    assert queue.status(retry_id)["status"] == QUEUED
+
+
+def test_submit_rejects_unknown_kind(queue):
+    with pytest.raises(ValueError, match="unknown job kind"):
+        queue.submit("key", "unknown", PAYLOAD)
+
+
+def test_requeue_running(queue):
+    job_id = queue.submit("key", "transitions", PAYLOAD)
+    queue.claim("worker-0")
+    assert queue.requeue_running() == 1
+    status = queue.status(job_id)
+    assert status["status"] == QUEUED
+    assert status["worker"] is None
+    assert queue.claim("worker-1")[0] == job_id
+
+
+def test_fail_running_only_affects_worker(queue):
+    first = queue.submit("a", "transitions", PAYLOAD)
+    second = queue.submit("b", "transitions", PAYLOAD)
+    queue.claim("worker-0")
+    queue.claim("worker-1")
+
+    assert queue.fail_running("worker-0", "Worker 0 exited with code -9.") == 1
+    status = queue.status(first)
+    assert status["status"] == FAILED
+    assert "code -9" in status["error"]
+    assert queue.status(second)["status"] == RUNNING
+    assert queue.fail_running("worker-0", "again") == 0
+
+
+def test_cancel_only_queued_job(queue):
+    first = queue.submit("a", "transitions", PAYLOAD)
+    second = queue.submit("b", "transitions", PAYLOAD)
+    queue.claim("worker-0")
+
+    assert not queue.cancel(first, "timeout")
+    assert queue.status(first)["status"] == RUNNING
+    assert queue.cancel(second, "timeout")
+    status = queue.status(second)
+    assert (status["status"], status["error"]) == (FAILED, "timeout")
+    assert queue.claim("worker-1") is None
+    assert queue.submit("b", "transitions", PAYLOAD) != second
+
+
+def test_workers_alive_follows_heartbeat(queue):
+    assert not queue.workers_alive()
+    queue.heartbeat()
+    assert queue.pid_path.read_text() == str(os.getpid())
+    assert queue.workers_alive()
+    stale = time.time() - 60
+    os.utime(queue.pid_path, (stale, stale))
+    assert not queue.workers_alive(timeout=10)
@@ -0,0 +1,91 @@
+"""pipeline のテスト."""
+
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import find_triger
+from pipeline import analyze_transitions
+
+
+def test_pipeline_uses_diff_analyzer():
+    analyzer = find_triger.StateTransitionAnalyzer([0, 0, 1, 1, 0, 0, 1, 0])
+    np.testing.assert_array_equal(analyzer.get_off_to_on_transitions(), [1, 5])
+    np.testing.assert_array_equal(analyzer.get_on_to_off_transitions(), [3, 6])
+
+
+def test_analyze_transitions():
+    table = pd.DataFrame({"state": [0, 0, 1, 1, 0, 0, 1, 0]})
+    transitions = analyze_transitions(table, {"state_column": "state", "sample_period": 0.5})
+    assert transitions["kind"].tolist() == ["off_on", "on_off", "off_on", "on_off"]
+    assert transitions["index"].tolist() == [1, 3, 5, 6]
+    assert transitions["time"].tolist() == [0.5, 1.5, 2.5, 3.0]
+
+
+def test_analyze_transitions_min_duration():
+    # 最小継続点数は直前の同じ向きの遷移 (最初の遷移は先頭) からの点数
+    table = pd.DataFrame({"state": [0, 0, 1, 1, 0, 0, 0, 1, 0, 1, 0]})
+    params = {"state_column": "state", "off_to_on_min_duration": 2, "on_to_off_min_duration": 4}
+    transitions = analyze_transitions(table, params)
+    assert transitions["kind"].tolist() == ["off_on", "on_off", "off_on"]
+    assert transitions["index"].tolist() == [6, 7, 8]
+
+
+def test_process_files(tmp_path):
+    from pipeline import process_files
+
+    paths = []
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        path = tmp_path / name / "data.csv"
+        pd.DataFrame({"state": [0, 1, 1, 0, 1, 0], "value": np.arange(6.0)}).to_csv(path, index=False)
+        paths.append(path)
+
+    summary = process_files(
+        paths,
+        tmp_path / "out",
+        {"state_column": "state"},
+        {"columns": ["value"], "src_period": 1.0, "dst_period": 2.0},
+    )
+
+    assert summary[["off_on", "on_off"]].to_numpy().tolist() == [[2, 2], [2, 2]]
+    written = pd.read_parquet(tmp_path / "out" / "transitions.parquet")
+    assert written["file"].tolist() == [str(paths[0])] * 4 + [str(paths[1])] * 4
+    assert len(pd.read_excel(tmp_path / "out" / "transitions.xlsx")) == 8
+    for number in ("00000", "00001"):
+        resampled = np.load(tmp_path / "out" / f"{number}_data_resampled.npy")
+        time = np.load(tmp_path / "out" / f"{number}_data_time.npy")
+        assert resampled.shape == (1, len(time))
+
+
+@pytest.fixture
+def fake_ruptures(monkeypatch):
+    """KernelCPD の代わりに状態が変わる位置を変化点として返すモジュール."""
+
+    class KernelCPD:
+        def __init__(self, kernel):
+            assert kernel == "linear"
+
+        def fit(self, signal):
+            self.signal = signal
+            return self
+
+        def predict(self, pen):
+            return [*(np.flatnonzero(np.diff(self.signal)) + 1).tolist(), len(self.signal)]
+
+    monkeypatch.setitem(sys.modules, "ruptures", types.SimpleNamespace(KernelCPD=KernelCPD))
+
+
+def test_cpd_detector_matches_diff(fake_ruptures):
+    table = pd.DataFrame({"state": [0, 0, 1, 1, 0, 0, 0, 1, 0, 1, 0]})
+    params = {"state_column": "state", "off_to_on_min_duration": 2}
+    cpd = analyze_transitions(table, {**params, "detector": "cpd"})
+    pd.testing.assert_frame_equal(cpd, analyze_transitions(table, params))
+
+
+def test_unknown_detector():
+    with pytest.raises(ValueError, match="detector must be one of"):
+        analyze_transitions(pd.DataFrame({"state": [0, 1]}), {"detector": "unknown"})
@@ -0,0 +1,131 @@
+"""profiling のテスト."""
+
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import profiling
+
+
+@pytest.fixture
+def enabled(tmp_path, monkeypatch):
+    """計測を有効にした状態 (atexitやcProfileは使わない)."""
+    monkeypatch.setattr(profiling, "ENABLED", True)
+    monkeypatch.setattr(profiling, "TRACE_MEMORY", True)
+    monkeypatch.setattr(profiling, "_started", True)
+    monkeypatch.setattr(profiling, "_profiler", None)
+    monkeypatch.setattr(profiling, "_stats", {})
+    monkeypatch.setattr(profiling, "_process_id", None)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(profiling, "RUN_ID", "run-1")
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    yield tmp_path
+    if not tracing:
+        tracemalloc.stop()
+
+
+def test_disabled_returns_original_objects(monkeypatch):
+    monkeypatch.setattr(profiling, "ENABLED", False)
+
+    def func():
+        return 1
+
+    class Analyzer:
+        def method(self):
+            return 2
+
+    method = Analyzer.__dict__["method"]
+    assert profiling.profiled("func")(func) is func
+    assert profiling.instrument_class("Analyzer")(Analyzer) is Analyzer
+    assert Analyzer.__dict__["method"] is method
+    assert profiling.dump() is None
+
+
+def test_instrument_class_records_public_methods(enabled):
+    @profiling.instrument_class("Analyzer")
+    class Analyzer:
+        def method(self):
+            return self._helper()
+
+        def _helper(self):
+            return 2
+
+    assert Analyzer().method() == 2
+    assert list(profiling._stats) == ["Analyzer.method"]
+    assert profiling._stats["Analyzer.method"]["calls"] == 1
+
+
+def test_merge_adds_processes(enabled, monkeypatch):
+    profiling._record("step", 0.5, 0.25, 100)
+    profiling._record("step", 1.5, 0.75, None)
+    first = profiling.dump()
+
+    monkeypatch.setattr(profiling, "_stats", {})
+    monkeypatch.setattr(profiling, "_process_id", (1, 1))
+    profiling._record("step", 2.0, 1.0, 300)
+    profiling._record("other", 1e-3, 1e-3, None)
+    second = profiling.dump()
+    assert first != second
+
+    merged = profiling.merge(enabled)
+    step = merged["step"]
+    assert step["calls"] == 3
+    assert step["processes"] == 2
+    assert step["wall_total"] == pytest.approx(4.0)
+    assert step["cpu_total"] == pytest.approx(2.0)
+    assert step["wall_max"] == 2.0
+    assert step["peak_bytes"] == 300
+    assert sum(step["wall_hist"]) == 3
+    assert merged["other"]["calls"] == 1
+    assert "step" in profiling.report(enabled)
+
+
+def test_runs_are_kept_apart(enabled, monkeypatch):
+    profiling._record("old", 1.0, 1.0, None)
+    profiling.dump()
+    monkeypatch.setattr(profiling, "RUN_ID", "run-2")
+    monkeypatch.setattr(profiling, "_stats", {})
+    profiling._record("new", 1.0, 1.0, None)
+    profiling.dump()
+
+    assert set(profiling.runs(enabled)) == {"run-1", "run-2"}
+    assert list(profiling.merge(enabled, run="run-1")) == ["old"]
+    assert list(profiling.merge(enabled, run="run-2")) == ["new"]
+    profiling.clear(enabled, run="run-1")
+    assert profiling.runs(enabled) == ["run-2"]
+    profiling.clear(enabled)
+    assert profiling.merge(enabled) == {}
+
+
+def test_hist_percentile():
+    hist = [0, 2, 0, 2]
+    base = profiling.BUCKET_BASE
+    assert profiling.hist_percentile(hist, 50) == base * 2
+    assert profiling.hist_percentile(hist, 90) == base * 8
+    assert profiling.hist_percentile([0, 0, 0], 50) == base * 4
+    assert profiling._bucket(base / 2) == 0
+    assert profiling._bucket(base * 3) == 2
+    assert profiling._bucket(1e9) == profiling.N_BUCKETS - 1
+
+
+def test_nested_peak_memory(enabled):
+    size = 8 * 1024**2
+
+    @profiling.profiled("inner")
+    def inner():
+        return np.ones(size, dtype=np.uint8).sum()
+
+    @profiling.profiled("outer")
+    def outer():
+        inner()
+        # innerの一時配列は解放済みで、外側の確保はinnerより小さい
+        return np.ones(size // 8, dtype=np.uint8).sum()
+
+    outer()
+    assert profiling._stats["inner"]["peak_bytes"] >= size
+    # innerでreset_peakされても、外側のピークにはinnerのピークが含まれる
+    assert profiling._stats["outer"]["peak_bytes"] >= size
+    assert profiling._local.frames == []
@@ -0,0 +1,138 @@
+"""result_cache のテスト."""
+
+import threading
+
+import numpy as np
+
+from result_cache import ResultCache, make_key
+
+KB = 1024
+
+
+def array(kb):
+    return np.zeros(kb * KB, dtype=np.uint8)
+
+
+def test_make_key_ignores_param_order():
+    assert make_key("abc", "resample", {"a": 1, "b": 2}) == make_key("abc", "resample", {"b": 2, "a": 1})
+    assert make_key("abc", "resample", {"a": 1}) != make_key("abc", "transitions", {"a": 1})
+
+
+def test_lru_order_memory_only():
+    cache = ResultCache(max_memory_bytes=3 * KB)
+    for key in "abc":
+        cache.put(key, array(1))
+    assert cache.get("a") is not None  # aを最近使ったものにする
+    cache.put("d", array(1))
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+    assert cache.stats()["memory_bytes"] <= 3 * KB
+
+
+def test_spill_and_reload(tmp_path):
+    cache = ResultCache(max_memory_bytes=2 * KB, disk_dir=tmp_path)
+    values = {key: np.full(KB, i, dtype=np.uint8) for i, key in enumerate("abc")}
+    for key, value in values.items():
+        cache.put(key, value)
+    stats = cache.stats()
+    assert (stats["memory_entries"], stats["disk_entries"]) == (2, 1)
+    assert (tmp_path / "a.pkl").exists()
+
+    np.testing.assert_array_equal(cache.get("a"), values["a"])
+    assert not (tmp_path / "a.pkl").exists()
+    assert (tmp_path / "b.pkl").exists()
+    stats = cache.stats()
+    assert (stats["memory_entries"], stats["disk_entries"]) == (2, 1)
+
+    # 再起動後もディスクのエントリを使える
+    restarted = ResultCache(max_memory_bytes=2 * KB, disk_dir=tmp_path)
+    np.testing.assert_array_equal(restarted.get("b"), values["b"])
+
+
+def test_oversized_entry_goes_to_disk(tmp_path):
+    cache = ResultCache(max_memory_bytes=2 * KB, disk_dir=tmp_path)
+    cache.put("big", array(4))
+    stats = cache.stats()
+    assert stats["memory_bytes"] == 0
+    assert stats["disk_entries"] == 1
+
+    memory_only = ResultCache(max_memory_bytes=2 * KB)
+    memory_only.put("big", array(4))
+    assert memory_only.stats()["memory_bytes"] == 0
+    assert memory_only.get("big") is None
+
+
+def test_disk_limit(tmp_path):
+    cache = ResultCache(max_memory_bytes=KB, disk_dir=tmp_path, max_disk_bytes=3 * KB)
+    for key in "abcdef":
+        cache.put(key, array(1))
+    stats = cache.stats()
+    assert stats["disk_bytes"] <= 3 * KB
+    assert cache.get("a") is None
+    assert cache.get("e") is not None
+
+
+def test_corrupt_disk_entry_is_a_miss(tmp_path):
+    cache = ResultCache(max_memory_bytes=KB, disk_dir=tmp_path)
+    cache.put("a", array(1))
+    cache.put("b", array(1))
+    (tmp_path / "a.pkl").write_bytes(b"broken")
+    assert cache.get("a", "default") == "default"
+    assert not (tmp_path / "a.pkl").exists()
+
+
+def test_get_or_compute_runs_once():
+    cache = ResultCache()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute)))]
+    threads[0].start()
+    started.wait()
+    threads += [threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute))) for _ in range(3)]
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["value"] * 4
+    assert len(calls) == 1
+
+
+def test_disk_io_does_not_hold_lock(tmp_path, monkeypatch):
+    import pickle
+
+    cache = ResultCache(max_memory_bytes=KB, disk_dir=tmp_path)
+    cache.put("small", array(1))
+    writing = threading.Event()
+    release = threading.Event()
+    dump = pickle.dump
+
+    def slow_dump(*args, **kwargs):
+        writing.set()
+        release.wait()
+        dump(*args, **kwargs)
+
+    monkeypatch.setattr(pickle, "dump", slow_dump)
+    thread = threading.Thread(target=cache.put, args=("big", array(2)))
+    thread.start()
+    writing.wait()
+    # 退避の書き込み中も他のキーは取得でき、同じキーの取得は書き込みを待つ
+    assert cache.stats()["disk_entries"] == 0
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(cache.get("big")))
+    waiter.start()
+    waiter.join(timeout=0.2)
+    assert waiter.is_alive()
+    release.set()
+    thread.join()
+    waiter.join()
+    assert result[0] is not None
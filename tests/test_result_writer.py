@@ -0,0 +1,60 @@
+"""result_writer のテスト."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from result_writer import ResultWriter
+
+
+def test_add_array_keeps_files_with_same_name(tmp_path):
+    with ResultWriter(tmp_path, excel_name=None, parquet_name=None) as writer:
+        writer.add_array("a/x.csv", "res", np.zeros(3))
+        writer.add_array("b/x.csv", "res", np.ones(3))
+        writer.add_array("a/x.csv", "time", np.arange(3))
+        with pytest.raises(ValueError, match="already been added"):
+            writer.add_array("b/x.csv", "res", np.ones(3))
+
+    np.testing.assert_array_equal(np.load(tmp_path / "00000_x_res.npy"), np.zeros(3))
+    np.testing.assert_array_equal(np.load(tmp_path / "00001_x_res.npy"), np.ones(3))
+    np.testing.assert_array_equal(np.load(tmp_path / "00000_x_time.npy"), np.arange(3))
+
+
+def test_parquet_row_groups(tmp_path):
+    import pyarrow.parquet as pq
+
+    table = pd.DataFrame({"kind": ["off_on", "on_off"], "index": [1, 3]})
+    with ResultWriter(tmp_path, excel_name=None, flush_rows=4) as writer:
+        for i in range(5):
+            writer.add_transitions(f"file{i}.csv", table)
+
+    written = pd.read_parquet(tmp_path / "transitions.parquet")
+    assert len(written) == 10
+    assert written["file"].tolist()[::2] == [f"file{i}.csv" for i in range(5)]
+    assert pq.ParquetFile(tmp_path / "transitions.parquet").num_row_groups == 3
+
+
+def test_add_array_copies_buffer(tmp_path):
+    buffer = np.zeros(3)
+    with ResultWriter(tmp_path, excel_name=None, parquet_name=None) as writer:
+        writer.add_array("x.csv", "res", buffer)
+        buffer[:] = 1
+    np.testing.assert_array_equal(np.load(tmp_path / "00000_x_res.npy"), np.zeros(3))
+
+
+def test_excel_splits_sheets(tmp_path, monkeypatch):
+    import result_writer
+
+    monkeypatch.setattr(result_writer, "EXCEL_MAX_ROWS", 3)
+    table = pd.DataFrame({"kind": ["off_on", "on_off"], "index": [1, 3]})
+    with ResultWriter(tmp_path, parquet_name=None) as writer:
+        for i in range(4):
+            writer.add_transitions(f"file{i}.csv", table)
+
+    sheets = pd.read_excel(tmp_path / "transitions.xlsx", sheet_name=None)
+    assert list(sheets) == ["transitions", "transitions_2", "transitions_3"]
+    assert [len(sheet) for sheet in sheets.values()] == [3, 3, 2]
+    written = pd.concat(sheets.values(), ignore_index=True)
+    assert list(written.columns) == ["file", "kind", "index"]
+    assert written["file"].tolist() == [f"file{i}.csv" for i in range(4) for _ in range(2)]
+    assert written["index"].tolist() == [1, 3] * 4
@@ -0,0 +1,83 @@
+"""service_metrics のテスト."""
+
+import csv
+import json
+import time
+
+import pytest
+
+import service_metrics
+from service_metrics import HISTORY_COLUMNS, MetricsRecorder, flatten, format_snapshot, percentile
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([3.0], 90) == 3.0
+    values = [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert percentile(values, 0) == 1.0
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 100) == 5.0
+    assert percentile(values, 90) == pytest.approx(4.6)
+
+
+def test_flatten():
+    assert flatten({"a": 1, "b": {"c": 2, "d": {"e": 3}}}) == {"a": 1, "b.c": 2, "b.d.e": 3}
+
+
+def test_snapshot_and_history(tmp_path):
+    recorder = MetricsRecorder(tmp_path / "metrics.json", history_path=tmp_path / "history.csv", history_interval=0)
+    for seconds in (0.1, 0.2, 0.3):
+        recorder.observe("request", seconds)
+    recorder.add_source("cache", lambda: {"hit_ratio": 0.5, "memory_bytes": 10, "disk_bytes": 20})
+    recorder.add_source("broken", lambda: 1 / 0)
+
+    snapshot = recorder.write()
+    assert json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))["latency"] == snapshot["latency"]
+    assert snapshot["latency"]["request"]["count"] == 3
+    assert snapshot["latency"]["request"]["p50"] == pytest.approx(0.2)
+    assert "error" in snapshot["broken"]
+
+    # 後から別の処理の遅延が増えても列は変わらず、ヘッダーは1回だけ書かれる
+    recorder.observe("analysis", 1.0)
+    recorder.write()
+    with (tmp_path / "history.csv").open(encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == HISTORY_COLUMNS
+    assert len(rows) == 3
+    assert all(len(row) == len(HISTORY_COLUMNS) for row in rows)
+    first, second = (dict(zip(rows[0], row, strict=True)) for row in rows[1:])
+    assert first["latency.analysis.p50"] == ""
+    assert float(second["latency.analysis.p50"]) == 1.0
+    assert float(first["cache.hit_ratio"]) == 0.5
+
+
+def test_history_interval(tmp_path):
+    recorder = MetricsRecorder(tmp_path / "metrics.json", history_path=tmp_path / "history.csv", history_interval=3600)
+    recorder.write()
+    recorder.write()
+    assert len((tmp_path / "history.csv").read_text(encoding="utf-8").splitlines()) == 2
+
+
+def test_session_timeout(tmp_path):
+    recorder = MetricsRecorder(tmp_path / "metrics.json")
+    recorder.touch_session("active")
+    recorder.touch_session("idle")
+    recorder._sessions["idle"] = time.time() - service_metrics.SESSION_TIMEOUT - 1
+    assert recorder.snapshot()["active_sessions"] == 1
+    assert list(recorder._sessions) == ["active"]
+
+
+def test_format_snapshot(tmp_path):
+    recorder = MetricsRecorder(tmp_path / "metrics.json")
+    recorder.observe("request", 0.25)
+    recorder.add_source("cache", lambda: {"hit_ratio": 0.75, "hits": 3, "misses": 1, "memory_bytes": 0, "disk_bytes": 0})
+    recorder.add_source("queue", lambda: {"queued": 1, "running": 2, "done": 0, "failed": 0})
+    text = format_snapshot(recorder.snapshot())
+    assert "Active sessions: 0" in text
+    assert "p50=250ms" in text
+    assert "hit ratio 75.0%" in text
+    assert "queued=1 running=2" in text
+    assert "stale" not in text
+
+    stale = {**recorder.snapshot(), "timestamp": time.time() - 10 * service_metrics.METRICS_INTERVAL}
+    assert "stale" in format_snapshot(stale)
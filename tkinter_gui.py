@@ -1,13 +1,82 @@
 """tkinterによるGUIコードサンプル."""
 
+import importlib
+import os
+import sys
 import time
 import tkinter as tk
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
 from tkinter import filedialog, messagebox, ttk
 
 WINDOW_SIZE = "800x600"
 DEFAULT_PADDING = 5
 
 
+def process_uptime() -> float | None:
+    """プロセスの開始からの経過時間[sec].
+
+    /proc から読み、なければpsutilを使う (取得できない場合はNone)。
+    psutilのimport時間が計測に入らないよう /proc を優先する。
+    """
+    try:
+        stat = Path("/proc/self/stat").read_text()
+        uptime = float(Path("/proc/uptime").read_text().split()[0])
+    except OSError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return time.time() - psutil.Process().create_time()
+    # プロセス名に空白が含まれることがあるため、最後の ")" より後ろを分割する
+    # starttime は22番目の項目 (")" より後ろでは20番目)
+    start_ticks = int(stat.rsplit(")", 1)[1].split()[19])
+    return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+# 起動時間計測の基準 モジュールの読み込み完了時の時刻と、
+# プロセスの開始からそこまでの時間 (インタプリタの起動とimportを含む)
+_MODULE_LOADED = time.perf_counter()
+_LOAD_UPTIME = process_uptime()
+
+
+@dataclass(frozen=True)
+class TabSpec:
+    """解析タブの定義.
+
+    タブはタイトルとローダーだけを先に登録し、最初に選択されたときに
+    ローダーを呼び出してクラスを取得・構築する。重いimportはローダーの中で行う。
+
+    Attributes:
+        title (str): タブに表示する名前
+        loader (Callable[[], type] | None): タブクラスを返す関数。Noneの場合は空のタブ
+            タブクラスは ``cls(guiapp, frame)`` で構築できること
+
+    """
+
+    title: str
+    loader: Callable[[], type] | None = None
+
+
+def load_from(path: str) -> Callable[[], type]:
+    """"module:attr" 形式の文字列からタブクラスのローダーを作成.
+
+    Args:
+        path (str): "find_triger_tab:TriggerTab" のようなimportパス
+
+    Returns:
+        Callable[[], type]: 呼び出したときに初めてimportするローダー
+
+    """
+    module_name, _, attr = path.partition(":")
+
+    def loader() -> type:
+        return getattr(importlib.import_module(module_name), attr)
+
+    return loader
+
+
 class GUIApp:
     """メインGUIアプリケーションクラス.
 
@@ -30,13 +99,24 @@ class GUIApp:
         self.root.title("データ処理アプリケーション")
         self.root.geometry(WINDOW_SIZE)
 
-        # タブの処理状態を管理する辞書を初期化
+        # タブの処理状態を管理する辞書を初期化 構築済みのタブのみが入る
         self.processing_tabs = {}
+        # 未構築のタブ フレーム名 -> (frame, TabSpec)
+        self.pending_tabs = {}
+        # 起動時間の計測結果 区間名 -> 秒
+        self.startup_times = {}
+        if _LOAD_UPTIME is not None:
+            self.startup_times["import"] = _LOAD_UPTIME
+        self.startup_times["before_init"] = time.perf_counter() - _MODULE_LOADED
 
         # 終了時の処理を設定
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+        start = time.perf_counter()
         self.create_widgets()
+        self.startup_times["create_widgets"] = time.perf_counter() - start
+        # 最初の描画が終わった時点で起動時間を報告する
+        self.root.after_idle(self.report_startup)
 
     def create_widgets(self) -> None:
         """tabを作れる状態として、クローズボタンを設定."""
@@ -48,11 +128,15 @@ class GUIApp:
         self.notebook = ttk.Notebook(main_frame)
         self.notebook.pack(expand=True, fill="both", pady=(0, 10))
 
-        # タブの作成 個々への配置の順番でタブの順番が決定
-        self.analysis_tab = Ananlysis(self)
-        self.processing_tabs["データ処理"] = self.analysis_tab  # タブを処理管理に追加
-        self.tab2 = ttk.Frame(self.notebook)
-        self.notebook.add(self.tab2, text="データ2")
+        # タブの作成 TAB_REGISTRYの順番でタブの順番が決定
+        # ここでは空のフレームだけを追加し、中身は選択されたときに構築する
+        for spec in TAB_REGISTRY:
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=spec.title)
+            self.pending_tabs[str(frame)] = (frame, spec)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        # 初期選択のタブは最初のアイドル時に構築する
+        self.root.after_idle(self.on_tab_changed)
 
         # ボタン配置フレーム
         button_frame = ttk.Frame(main_frame)
@@ -64,6 +148,41 @@ class GUIApp:
         )
         self.close_button.pack(side="right", padx=DEFAULT_PADDING)
 
+    def on_tab_changed(self, _event: tk.Event | None = None) -> None:
+        """選択されたタブが未構築であれば構築.
+
+        構築に失敗したタブは未構築のまま残し、次に選択されたときに再度構築する。
+        """
+        selected = self.notebook.select()
+        if selected not in self.pending_tabs:
+            return
+        frame, spec = self.pending_tabs[selected]
+        if spec.loader is None:
+            del self.pending_tabs[selected]
+            return
+
+        start = time.perf_counter()
+        try:
+            tab_class = spec.loader()
+            self.processing_tabs[spec.title] = tab_class(self, frame)
+        except Exception as e:  # noqa: BLE001
+            # 途中まで作られたウィジェットを消して再試行できるようにする
+            for child in frame.winfo_children():
+                child.destroy()
+            messagebox.showerror("エラー", f"タブ「{spec.title}」の読み込みに失敗しました: {e}")
+            return
+        del self.pending_tabs[selected]
+        elapsed = time.perf_counter() - start
+        self.startup_times[f"tab:{spec.title}"] = elapsed
+        print(f"タブ「{spec.title}」構築: {elapsed:.3f}s", file=sys.stderr)
+
+    def report_startup(self) -> None:
+        """起動にかかった時間を標準エラーに出力."""
+        # プロセスの開始から (取得できない場合はモジュールの読み込み完了から) の合計
+        self.startup_times["first_idle"] = (_LOAD_UPTIME or 0.0) + time.perf_counter() - _MODULE_LOADED
+        report = " / ".join(f"{name} {sec:.3f}s" for name, sec in self.startup_times.items())
+        print(f"起動時間: {report}", file=sys.stderr)
+
     def check_processing_status(self) -> bool:
         """全タブの処理状態をチェック.
 
@@ -114,12 +233,13 @@ class Ananlysis:
 
     """
 
-    def __init__(self, guiapp: ttk) -> None:
+    def __init__(self, guiapp: GUIApp, frame: ttk.Frame) -> None:
         """イニシャル処理.
 
-        notebookを受け取り、タブを作成。GUIを作成する
+        notebookに追加済みのフレームを受け取り、GUIを作成する
         Args:
-            notebook (ttk.Notebook): _description_
+            guiapp (GUIApp): メインGUIアプリケーション
+            frame (ttk.Frame): タブとして追加済みのフレーム
         """
         self.guiapp = guiapp
         # 状態管理用の変数
@@ -132,11 +252,8 @@ class Ananlysis:
             "3. 実行ボタンを押して処理を開始してください",
         ]
 
-        # タブ作成
-        # notebookにフレームを作成
-        self.analysis_tab = ttk.Frame(self.guiapp.notebook)
-        # 作成したフレームをタブとして追加
-        self.guiapp.notebook.add(self.analysis_tab, text="データ処理")
+        # タブ用のフレーム notebookへの追加はGUIAppが行う
+        self.analysis_tab = frame
 
         # analysis_tabの処理
         self.create_tab_widgets()
@@ -419,6 +536,14 @@ class Ananlysis:
                     widget.config(state=state)
 
 
+# 解析タブの登録 ここへの記載順がタブの順番になる
+# 重いライブラリを使うタブは load_from("module:Class") で登録し、選択時にimportさせる
+TAB_REGISTRY = [
+    TabSpec("データ処理", lambda: Ananlysis),
+    TabSpec("データ2"),
+]
+
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = GUIApp(root)